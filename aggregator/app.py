@@ -0,0 +1,136 @@
+from flask import Flask, g, jsonify, request
+import gzip
+import json
+import os
+import sqlite3
+import time
+
+# Central service that merges minute counts pushed by the devices under devices/
+
+app = Flask(__name__)
+
+DB_PATH = os.getenv('FLEET_DB_PATH', 'fleet.db')
+
+# Minute counts older than this are deleted
+RETENTION_DAYS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS minute_counts (
+    device TEXT NOT NULL,
+    minute INTEGER NOT NULL,
+    count REAL NOT NULL,
+    PRIMARY KEY (device, minute)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS minute_counts_minute ON minute_counts (minute);
+CREATE TABLE IF NOT EXISTS devices (
+    device TEXT PRIMARY KEY,
+    room TEXT NOT NULL,
+    last_push INTEGER NOT NULL
+);
+"""
+
+
+def get_db():
+    """Open one SQLite connection per request."""
+    if 'db' not in g:
+        g.db = sqlite3.connect(app.config.get('DB_PATH', DB_PATH))
+        g.db.executescript(SCHEMA)
+    return g.db
+
+
+@app.teardown_appcontext
+def close_db(exception):
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
+
+
+@app.route('/ingest', methods=['POST'])
+def ingest():
+    """Upsert a batch of minute counts from one device."""
+    try:
+        body = request.get_data()
+        if request.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        batch = json.loads(body)
+
+        device = str(batch['device'])
+        room = str(batch['room'])
+        rows = [(device, int(minute), float(count)) for minute, count in batch['minutes']]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return jsonify({'error': f'Invalid batch: {e}'}), 400
+
+    db = get_db()
+    with db:
+        # Re-sent minutes replace what we have, so retries and backfills are idempotent
+        db.executemany(
+            'INSERT INTO minute_counts (device, minute, count) VALUES (?, ?, ?) '
+            'ON CONFLICT (device, minute) DO UPDATE SET count = excluded.count',
+            rows,
+        )
+        db.execute(
+            'INSERT INTO devices (device, room, last_push) VALUES (?, ?, ?) '
+            'ON CONFLICT (device) DO UPDATE SET room = excluded.room, last_push = excluded.last_push',
+            (device, room, int(time.time())),
+        )
+        cutoff = int(time.time() // 60) - RETENTION_DAYS * 1440
+        db.execute('DELETE FROM minute_counts WHERE minute < ?', (cutoff,))
+
+    return jsonify({'accepted': len(rows)})
+
+
+def query_series(since, device=None, room=None):
+    """Per-minute counts summed across the selected devices, oldest first."""
+    sql = ('SELECT minute_counts.minute, SUM(minute_counts.count) FROM minute_counts '
+           'JOIN devices ON devices.device = minute_counts.device '
+           'WHERE minute_counts.minute >= ?')
+    params = [since]
+    if device is not None:
+        sql += ' AND minute_counts.device = ?'
+        params.append(device)
+    if room is not None:
+        sql += ' AND devices.room = ?'
+        params.append(room)
+    sql += ' GROUP BY minute_counts.minute ORDER BY minute_counts.minute'
+
+    rows = get_db().execute(sql, params).fetchall()
+    return {
+        'minutes': [minute for minute, _ in rows],
+        'counts': [round(count, 2) for _, count in rows],
+    }
+
+
+def since_minute():
+    hours = request.args.get('hours', default=48, type=int)
+    return int(time.time() // 60) - hours * 60
+
+
+@app.route('/devices')
+def devices():
+    rows = get_db().execute('SELECT device, room, last_push FROM devices ORDER BY device').fetchall()
+    return jsonify([{'device': device, 'room': room, 'last_push': last_push}
+                    for device, room, last_push in rows])
+
+
+@app.route('/series')
+def series():
+    """Merged series for one device, one room, or the whole house if neither is given."""
+    return jsonify(query_series(since_minute(),
+                                device=request.args.get('device'),
+                                room=request.args.get('room')))
+
+
+@app.route('/house')
+def house():
+    """House-wide series alongside a series per room."""
+    since = since_minute()
+    rooms = [room for (room,) in
+             get_db().execute('SELECT DISTINCT room FROM devices ORDER BY room').fetchall()]
+    return jsonify({
+        'house': query_series(since),
+        'rooms': {room: query_series(since, room=room) for room in rooms},
+    })
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=int(os.getenv('FLEET_PORT', 5002)), threaded=True)
@@ -0,0 +1,107 @@
+"""Run several simulated devices against a local stand-in aggregator.
+
+Each device pushes through FleetPusher exactly as on a Pi, but requests go
+to the aggregator's Flask test client instead of the network. One device
+drops offline for a few passes and has to backfill from its spool.
+
+    python aggregator/simulate_fleet.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'devices', 'nwspkpi1'))
+
+from app import app  # noqa: E402
+from fleet_push import FleetPusher  # noqa: E402
+
+DEVICES = [
+    ('pi-living-1', 'living-room'),
+    ('pi-living-2', 'living-room'),
+    ('pi-kitchen', 'kitchen'),
+]
+
+PASSES = 6
+MINUTES_PER_PASS = 10
+
+
+class StandInTransport:
+    """Route FleetPusher POSTs to the Flask test client, optionally failing."""
+
+    def __init__(self, client):
+        self.client = client
+        self.offline = False
+
+    def __call__(self, url, body, headers):
+        if self.offline:
+            raise ConnectionRefusedError('simulated outage')
+        path = '/' + url.split('/', 3)[-1]
+        response = self.client.post(path, data=body, headers=headers)
+        return response.status_code
+
+
+def device_counts(device_index, pass_index, start):
+    """Minute counts for one pass; each device has a distinct constant level."""
+    minutes = pd.date_range(start + pd.Timedelta(minutes=pass_index * MINUTES_PER_PASS),
+                            periods=MINUTES_PER_PASS, freq='min')
+    return pd.DataFrame({'Timestamp': minutes, 'Count': float(device_index + 1)})
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['DB_PATH'] = os.path.join(tmp, 'fleet.db')
+        client = app.test_client()
+
+        pushers = []
+        for device, room in DEVICES:
+            transport = StandInTransport(client)
+            pusher = FleetPusher('http://aggregator', device, room,
+                                 spool_dir=os.path.join(tmp, device, 'spool'),
+                                 state_path=os.path.join(tmp, device, 'state.json'),
+                                 post=transport, sleep=lambda seconds: None)
+            pushers.append((pusher, transport))
+
+        start = pd.Timestamp.now(tz='UTC').floor('min') - pd.Timedelta(minutes=PASSES * MINUTES_PER_PASS)
+        data = {}
+        for pass_index in range(PASSES):
+            for device_index, (pusher, transport) in enumerate(pushers):
+                # The kitchen Pi loses its network for the middle passes
+                transport.offline = device_index == 2 and 1 <= pass_index <= 3
+
+                # Like counts.csv, each pass sees the whole window so far
+                new = device_counts(device_index, pass_index, start)
+                data[device_index] = pd.concat([data.get(device_index), new], ignore_index=True)
+                pusher.push(data[device_index])
+
+            kitchen = pushers[2][0]
+            print(f"pass {pass_index}: kitchen spool holds {kitchen.pending()} batches")
+
+        house = client.get('/house?hours=2').get_json()
+        total_minutes = PASSES * MINUTES_PER_PASS
+
+        # Every minute is present once, and sums across devices and rooms line up
+        assert len(house['house']['minutes']) == total_minutes, house['house']['minutes']
+        assert set(house['house']['counts']) == {6.0}, house['house']['counts']
+        assert set(house['rooms']['living-room']['counts']) == {3.0}
+        assert set(house['rooms']['kitchen']['counts']) == {3.0}
+        assert all(pusher.pending() == 0 for pusher, _ in pushers)
+
+        # Re-sending everything must not change the totals
+        for device_index, (pusher, _) in enumerate(pushers):
+            os.remove(pusher.state_path)
+            pusher.push(data[device_index])
+        again = client.get('/house?hours=2').get_json()
+        assert again['house'] == house['house']
+
+        print(f"{len(DEVICES)} devices, {total_minutes} minutes merged; "
+              f"house total {house['house']['counts'][0]} per minute")
+        print(client.get('/devices').get_json())
+
+
+if __name__ == '__main__':
+    started = time.perf_counter()
+    main()
+    print(f"done in {time.perf_counter() - started:.2f}s")
@@ -1,8 +1,5 @@
-from flask import Flask, send_file
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib
-import io
+from flask import Flask, Response, request
+import json
 import datetime
 import threading
 import time
@@ -11,25 +8,103 @@ import os
 import math
 from pathlib import Path
 
-# testing webhook (delete this line)
+from chart_variants import (DISPLAY_PROFILES, FORMATS, ChartVariants, content_etag,
+                            make_stack_chart_renderer, parse_variant)
+from export import EXPORT_FORMATS, export_filename, parse_export_args, stream_export
+from fleet_push import FleetPusher
+from rotation import RotationManifest
+from sessions import Sessionizer
+from snapshot import load_snapshot, save_snapshot
 
+# testing webhook (delete this line)
 
-# Configure matplotlib to use a memory-efficient backend
-matplotlib.use('Agg')
+# pandas, numpy and matplotlib are imported inside the functions that use them, so
+# the app can start and serve the warm-start snapshot before paying for those imports
 
 app = Flask(__name__)
 
+# Saved day-of-week by minute-of-day occupancy profile
+BASELINE_PATH = 'baseline.npz'
+
+# Epoch seconds of the newest log row already folded into counts.csv and its side tables
+AGGREGATE_STATE_PATH = 'aggregate_state.json'
+
+# Number of manufacturers shown individually; the rest are grouped as 'Other'
+MANUFACTURER_TOP_N = 5
+
 # Global variables to store cached data
 class DataCache:
     def __init__(self):
         self.scan_counts = None
+        self.manufacturer_counts = None
+        self.manufacturer_json = None
+        self.zone_counts = None
+        self.zones_json = None
+        self.visits_json = None
+        self.typical_today = None
+        self.forecast = None
+        self.baseline_json = None
+        # Per-day peaks for each chart series, keyed by day number (days since the epoch)
+        self.daily_peaks = {}
+        # Daily statistics JSON for each chart series
+        self.stats_json = None
         self.last_update = None
+        self.version = 0
+        # Charts from the warm-start snapshot, keyed by (width, height, fmt)
+        self.snapshot_charts = {}
         self.lock = threading.Lock()
 
 cache = DataCache()
 
+# /chart figures are built once per display size, and encoded images are cached per data version
+chart_variants = ChartVariants()
+
+# /chart/manufacturers is a single fixed size, re-rendered once per data version
+manufacturer_chart_variants = ChartVariants(max_pixels=math.prod(DISPLAY_PROFILES['default']),
+                                            renderer_factory=make_stack_chart_renderer)
+
+# Visit sessions are built from the raw scan rows; only touched by the update thread
+sessionizer = Sessionizer()
+
+# Weekly occupancy profile; loaded and updated by the update thread
+occupancy_baseline = None
+
+# Kiosk page list for display_rotation's rotator, cached against the config and pages mtimes
+rotation_manifest = RotationManifest()
+
+# Per-MAC RSSI history for proximity zoning; only touched by the update thread
+rssi_zoner = None
+
+# Daily peak and hourly statistics per chart series; only touched by the update thread
+stats_indexes = {}
+
+# Pushes minute counts to the fleet aggregator when FLEET_AGGREGATOR_URL is set
+fleet_pusher = FleetPusher.from_env()
+
+# Sends the fleet spool, so retries against a slow aggregator don't hold up update_data
+fleet_flush_thread = None
+
+def start_fleet_flush():
+    """Send the fleet spool on its own thread, unless the previous send is still retrying."""
+    global fleet_flush_thread
+    if fleet_pusher is None:
+        return
+    if fleet_flush_thread is not None and fleet_flush_thread.is_alive():
+        # Batches queued meanwhile stay in the spool for the next pass
+        return
+    fleet_flush_thread = threading.Thread(target=flush_fleet_spool, daemon=True)
+    fleet_flush_thread.start()
+
+def flush_fleet_spool():
+    try:
+        fleet_pusher.flush()
+    except Exception as e:
+        print(f"Error pushing to fleet aggregator: {e}")
+
 def update_counts_csv():
     """Update counts CSV with new data from daily log files."""
+    import pandas as pd
+
     try:
         counts_csv_path = 'counts.csv'
         logs_dir = 'logs'
@@ -40,8 +115,11 @@ def update_counts_csv():
             # Check if timestamps are timezone-naive before localizing
             if not counts_df.empty and counts_df['Timestamp'].dt.tz is None:
                 counts_df['Timestamp'] = counts_df['Timestamp'].dt.tz_localize('UTC')
+            # Counts saved before scans were logged have no scan column
+            if 'Scans' not in counts_df.columns:
+                counts_df['Scans'] = float('nan')
         else:
-            counts_df = pd.DataFrame(columns=['Timestamp', 'Count'])
+            counts_df = pd.DataFrame(columns=['Timestamp', 'Count', 'Scans'])
 
         # Determine the last processed timestamp
         if not counts_df.empty and len(counts_df) > 0:
@@ -50,9 +128,11 @@ def update_counts_csv():
         else:
             last_processed_time = None
             print("No previous data in counts.csv, will process all available data")
+        watermark = load_aggregate_watermark(last_processed_time)
 
         # Read data from daily log files (last 3 days to cover 48 hours)
         new_data_frames = []
+        scan_frames = []
         if os.path.exists(logs_dir):
             # Get all daily log files and sort them
             log_files = sorted(Path(logs_dir).glob('ble_log_*.csv'))
@@ -61,13 +141,21 @@ def update_counts_csv():
 
             for log_file in recent_log_files:
                 try:
-                    df = pd.read_csv(log_file, usecols=['Timestamp'])
+                    df = pd.read_csv(log_file, usecols=['Timestamp', 'MAC Address', 'RSSI', 'Manufacturer'])
                     new_data_frames.append(df)
                     print(f"Read {len(df)} rows from {log_file.name}")
                 except Exception as e:
                     print(f"Error reading {log_file}: {e}")
                     continue
 
+                # ble_scanner logs one row per scan alongside the detections
+                scan_log_file = log_file.with_name(log_file.name.replace('ble_log_', 'scans_'))
+                if scan_log_file.exists():
+                    try:
+                        scan_frames.append(pd.read_csv(scan_log_file, usecols=['Timestamp']))
+                    except Exception as e:
+                        print(f"Error reading {scan_log_file}: {e}")
+
         if new_data_frames:
             # Combine all data from the daily log files
             new_data = pd.concat(new_data_frames, ignore_index=True)
@@ -82,9 +170,15 @@ def update_counts_csv():
             if len(new_data) > 0 and new_data['Timestamp'].dt.tz is None:
                 new_data['Timestamp'] = new_data['Timestamp'].dt.tz_localize('UTC')
 
-            # Filter to only new data if we have a last processed time
-            if last_processed_time:
-                new_data = new_data[new_data['Timestamp'] > last_processed_time]
+            # The sessionizer keeps its own watermark, so it can see rows counts.csv already has
+            update_sessions(new_data)
+
+            # Filter to rows not yet counted. counts.csv only has whole minutes, so its
+            # last minute can't tell which of that minute's rows were already read
+            epoch_seconds = new_data['Timestamp'].values.astype('datetime64[s]').astype('int64')
+            if watermark is not None:
+                new_data = new_data[epoch_seconds > watermark]
+                epoch_seconds = epoch_seconds[epoch_seconds > watermark]
         else:
             new_data = pd.DataFrame(columns=['Timestamp'])
 
@@ -100,11 +194,15 @@ def update_counts_csv():
             new_counts = new_data.groupby('Timestamp').size().reset_index(name='Count')
             print(f"Aggregated into {len(new_counts)} minute-level counts")
 
+            # Scans run per minute, from the same window of the scan logs
+            new_counts = new_counts.merge(count_scans_per_minute(scan_frames, watermark),
+                                          on='Timestamp', how='left')
+
             # Append new counts to counts_df
             counts_df = pd.concat([counts_df, new_counts], ignore_index=True)
 
             # Aggregate counts_df by Timestamp to handle duplicates
-            counts_df = counts_df.groupby('Timestamp', as_index=False)['Count'].sum()
+            counts_df = counts_df.groupby('Timestamp', as_index=False)[['Count', 'Scans']].sum(min_count=1)
 
             # Remove data older than 48 hours
             now = pd.Timestamp.now(tz='UTC')
@@ -116,6 +214,11 @@ def update_counts_csv():
 
             # Save updated counts_df
             counts_df.to_csv(counts_csv_path, index=False)
+
+            # Keep the per-manufacturer counts in step with the totals
+            update_manufacturer_counts_csv(new_data)
+            update_zone_counts_csv(new_data)
+            save_aggregate_watermark(int(epoch_seconds.max()))
         else:
             # No new data; remove old data beyond 48 hours
             now = pd.Timestamp.now(tz='UTC')
@@ -123,18 +226,391 @@ def update_counts_csv():
             counts_df = counts_df[counts_df['Timestamp'] >= last_48_hours]
             counts_df.to_csv(counts_csv_path, index=False)
 
-        return counts_df
+        # Detections per scan, so counts don't depend on how often ble_scanner ran;
+        # minutes without a scan log (older data) are taken as a single scan
+        normalized = counts_df[['Timestamp']].copy()
+        normalized['Count'] = counts_df['Count'] / counts_df['Scans'].fillna(1)
+        return normalized
 
     except Exception as e:
         print(f"Error updating counts CSV: {e}")
         return None
 
+def load_aggregate_watermark(last_processed_time):
+    """Epoch seconds of the newest log row already counted, or None to count everything.
+
+    counts.csv saved before the watermark was kept falls back to its last
+    minute, taking every row in that minute as counted.
+    """
+    if last_processed_time is None:
+        return None
+
+    if os.path.exists(AGGREGATE_STATE_PATH):
+        try:
+            with open(AGGREGATE_STATE_PATH) as f:
+                return int(json.load(f)['watermark'])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Error reading {AGGREGATE_STATE_PATH}: {e}")
+    return int(last_processed_time.timestamp()) + 59
+
+def save_aggregate_watermark(watermark):
+    tmp_path = f"{AGGREGATE_STATE_PATH}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'watermark': watermark}, f)
+    os.replace(tmp_path, AGGREGATE_STATE_PATH)
+
+def count_scans_per_minute(scan_frames, watermark):
+    """Number of logged scans in each minute, from scans logged after the watermark."""
+    import pandas as pd
+
+    if not scan_frames:
+        return pd.DataFrame({'Timestamp': pd.Series(dtype='datetime64[ns, UTC]'),
+                             'Scans': pd.Series(dtype='float64')})
+
+    scans = pd.concat(scan_frames, ignore_index=True)
+    scans['Timestamp'] = pd.to_datetime(scans['Timestamp'], errors='coerce')
+    scans = scans.dropna(subset=['Timestamp'])
+    if len(scans) > 0 and scans['Timestamp'].dt.tz is None:
+        scans['Timestamp'] = scans['Timestamp'].dt.tz_localize('UTC')
+
+    # Same window as the detections, so a minute split across two passes sums correctly
+    if watermark is not None:
+        epoch_seconds = scans['Timestamp'].values.astype('datetime64[s]').astype('int64')
+        scans = scans[epoch_seconds > watermark]
+
+    scans['Timestamp'] = scans['Timestamp'].dt.floor('min')
+    scans_per_minute = scans.groupby('Timestamp').size().reset_index(name='Scans')
+    scans_per_minute['Scans'] = scans_per_minute['Scans'].astype('float64')
+    return scans_per_minute
+
+def update_sessions(scan_data):
+    """Feed scan rows newer than the sessionizer's watermark into it, in timestamp order."""
+    try:
+        scan_data = scan_data.dropna(subset=['MAC Address'])
+        scan_data = scan_data.sort_values('Timestamp', kind='stable')
+        epoch_seconds = scan_data['Timestamp'].values.astype('datetime64[s]').astype('int64')
+
+        if sessionizer.watermark is not None:
+            is_new = epoch_seconds > sessionizer.watermark
+            epoch_seconds = epoch_seconds[is_new]
+            scan_data = scan_data[is_new]
+
+        sessions = sessionizer.consume(epoch_seconds, scan_data['MAC Address'].values)
+        print(f"Sessionized {len(scan_data)} rows into {len(sessions)} finished visits, "
+              f"{len(sessionizer.active)} devices present")
+
+    except Exception as e:
+        print(f"Error updating visit sessions: {e}")
+
+def log_clock_seconds():
+    """Now, on the logs' clock: ble_scanner's wall-clock time, read as UTC like its timestamps."""
+    return datetime.datetime.now().replace(tzinfo=datetime.timezone.utc).timestamp()
+
+def flush_sessions():
+    """Close the visits of devices gone longer than the session gap, even with no new rows."""
+    try:
+        sessions = sessionizer.flush(log_clock_seconds())
+        if sessions:
+            print(f"Closed {len(sessions)} visits, {len(sessionizer.active)} devices present")
+
+    except Exception as e:
+        print(f"Error flushing visit sessions: {e}")
+
+def update_manufacturer_counts_csv(new_data):
+    """Append per-minute, per-manufacturer counts for newly processed rows."""
+    import pandas as pd
+
+    try:
+        manufacturer_csv_path = 'manufacturer_counts.csv'
+
+        if os.path.exists(manufacturer_csv_path):
+            manufacturer_df = pd.read_csv(manufacturer_csv_path, parse_dates=['Timestamp'])
+            if not manufacturer_df.empty and manufacturer_df['Timestamp'].dt.tz is None:
+                manufacturer_df['Timestamp'] = manufacturer_df['Timestamp'].dt.tz_localize('UTC')
+        else:
+            manufacturer_df = pd.DataFrame(columns=['Timestamp', 'Manufacturer', 'Count'])
+
+        # Older rows may be missing a manufacturer name
+        new_data = new_data.copy()
+        new_data['Manufacturer'] = new_data['Manufacturer'].fillna('Unknown')
+
+        # Aggregate counts per minute and manufacturer
+        new_counts = (new_data.groupby(['Timestamp', 'Manufacturer'])
+                      .size().reset_index(name='Count'))
+
+        manufacturer_df = pd.concat([manufacturer_df, new_counts], ignore_index=True)
+        manufacturer_df = manufacturer_df.groupby(
+            ['Timestamp', 'Manufacturer'], as_index=False)['Count'].sum()
+
+        # Remove data older than 48 hours
+        now = pd.Timestamp.now(tz='UTC')
+        last_48_hours = now - pd.Timedelta(hours=48)
+        manufacturer_df = manufacturer_df[manufacturer_df['Timestamp'] >= last_48_hours]
+
+        manufacturer_df.sort_values(['Timestamp', 'Manufacturer'], inplace=True)
+        manufacturer_df.to_csv(manufacturer_csv_path, index=False)
+
+    except Exception as e:
+        print(f"Error updating manufacturer counts CSV: {e}")
+
+def update_zone_counts_csv(new_data):
+    """Classify newly processed rows into RSSI zones and append per-minute zone counts."""
+    import numpy as np
+    import pandas as pd
+    from zoning import ZONES, RssiZoner, zone_minute_counts
+
+    global rssi_zoner
+    try:
+        zone_csv_path = 'zone_counts.csv'
+        columns = list(ZONES) + ['weighted']
+
+        if rssi_zoner is None:
+            rssi_zoner = RssiZoner()
+
+        new_data = new_data.dropna(subset=['MAC Address', 'RSSI'])
+        new_data = new_data.sort_values('Timestamp', kind='stable')
+        epoch_seconds = new_data['Timestamp'].values.astype('datetime64[s]').astype(np.int64)
+        macs = new_data['MAC Address'].values
+
+        zones = rssi_zoner.classify(epoch_seconds, macs, new_data['RSSI'].values)
+        minutes, counts = zone_minute_counts(epoch_seconds // 60, macs, zones)
+
+        new_counts = pd.DataFrame(counts, columns=columns)
+        new_counts.insert(0, 'Timestamp', pd.to_datetime(minutes * 60, unit='s', utc=True))
+
+        if os.path.exists(zone_csv_path):
+            zone_df = pd.read_csv(zone_csv_path, parse_dates=['Timestamp'])
+            if not zone_df.empty and zone_df['Timestamp'].dt.tz is None:
+                zone_df['Timestamp'] = zone_df['Timestamp'].dt.tz_localize('UTC')
+            zone_df = pd.concat([zone_df, new_counts], ignore_index=True)
+        else:
+            zone_df = new_counts
+
+        zone_df = zone_df.groupby('Timestamp', as_index=False)[columns].sum()
+
+        # Remove data older than 48 hours
+        now = pd.Timestamp.now(tz='UTC')
+        last_48_hours = now - pd.Timedelta(hours=48)
+        zone_df = zone_df[zone_df['Timestamp'] >= last_48_hours]
+
+        zone_df.sort_values('Timestamp', inplace=True)
+        zone_df.to_csv(zone_csv_path, index=False)
+
+    except Exception as e:
+        print(f"Error updating zone counts CSV: {e}")
+
+def read_recent_minutes(csv_path, index_col=None):
+    """Read a per-minute table with UTC timestamps, keeping the last 48 hours; None if there's no data."""
+    import pandas as pd
+
+    if not os.path.exists(csv_path):
+        return None
+
+    df = pd.read_csv(csv_path, parse_dates=['Timestamp'])
+    if df.empty:
+        return None
+    if df['Timestamp'].dt.tz is None:
+        df['Timestamp'] = df['Timestamp'].dt.tz_localize('UTC')
+
+    # Keep only data from the last 48 hours
+    now = pd.Timestamp.now(tz='UTC')
+    last_48_hours = now - pd.Timedelta(hours=48)
+    return df[df['Timestamp'] >= last_48_hours]
+
+def smooth_like_totals(frame):
+    """Smooth per-minute series the same way as the totals, so they line up with the main chart."""
+    frame = frame.rolling('15min', center=True, min_periods=1).mean()
+    frame = frame.ewm(span=5).mean()
+    return frame / 2
+
+def minute_series_json(frame, names_key):
+    """Serialize per-minute series, one per column, into the JSON bodies served by /manufacturers and /zones."""
+    payload = {
+        names_key: [str(name) for name in frame.columns],
+        'timestamps': [ts.isoformat() for ts in frame.index],
+        'series': {
+            str(name): [round(float(value), 1) for value in frame[name].values]
+            for name in frame.columns
+        },
+    }
+    return json.dumps(payload)
+
+def build_zone_series():
+    """Smoothed per-zone device counts and weighted occupancy, scaled like the totals."""
+    import pandas as pd
+
+    zone_df = read_recent_minutes('zone_counts.csv')
+    if zone_df is None:
+        return pd.DataFrame(dtype='float64')
+
+    zone_df = zone_df.set_index('Timestamp').astype('float64')
+    return smooth_like_totals(zone_df)
+
+def update_daily_stats(smoothed_counts, zone_counts):
+    """Feed the smoothed series into the daily statistics indexes; returns (peaks, JSON by series)."""
+    from daily_stats import DailyStatsIndex
+
+    series_by_name = {'total': smoothed_counts}
+    series_by_name.update({name: zone_counts[name] for name in zone_counts.columns})
+
+    for name, series in series_by_name.items():
+        index = stats_indexes.get(name)
+        if index is None:
+            index = stats_indexes[name] = DailyStatsIndex()
+        epoch_minutes = series.index.values.astype('datetime64[m]').astype('int64')
+        index.update(epoch_minutes, series.values)
+
+    daily_peaks = {name: index.all_peaks() for name, index in stats_indexes.items()}
+    stats_json = {name: index.summary_json() for name, index in stats_indexes.items()}
+    return daily_peaks, stats_json
+
+def build_manufacturer_breakdown(top_n=MANUFACTURER_TOP_N):
+    """Build smoothed per-minute counts for the top manufacturers plus an 'Other' bucket."""
+    import pandas as pd
+
+    manufacturer_df = read_recent_minutes('manufacturer_counts.csv')
+    if manufacturer_df is None:
+        return pd.DataFrame(dtype='float64')
+
+    # Detections per scan, like the totals; the scans per minute are kept in counts.csv
+    counts_df = read_recent_minutes('counts.csv')
+    if counts_df is not None and 'Scans' in counts_df.columns:
+        manufacturer_df = manufacturer_df.merge(counts_df[['Timestamp', 'Scans']],
+                                                on='Timestamp', how='left')
+        manufacturer_df['Count'] = manufacturer_df['Count'] / manufacturer_df['Scans'].fillna(1)
+
+    # Collapse everything outside the top N into a single 'Other' bucket
+    totals = manufacturer_df.groupby('Manufacturer')['Count'].sum()
+    top = totals.sort_values(ascending=False).index[:top_n]
+    manufacturer_df['Manufacturer'] = manufacturer_df['Manufacturer'].where(
+        manufacturer_df['Manufacturer'].isin(top), 'Other')
+
+    # One column per manufacturer, one row per minute
+    breakdown = manufacturer_df.pivot_table(index='Timestamp', columns='Manufacturer',
+                                            values='Count', aggfunc='sum', fill_value=0)
+    columns = [name for name in top] + (['Other'] if 'Other' in breakdown.columns else [])
+    breakdown = breakdown[columns].astype('float64')
+
+    # Smoothed like the totals so the stack lines up with the main chart
+    return smooth_like_totals(breakdown)
+
+def update_baseline(smoothed_counts):
+    """Fold the latest minutes into the weekly baseline and precompute the chart overlays."""
+    import pandas as pd
+    from baseline import OccupancyBaseline, baseline_json
+
+    global occupancy_baseline
+    if occupancy_baseline is None:
+        occupancy_baseline = OccupancyBaseline.load(BASELINE_PATH)
+    baseline = occupancy_baseline
+
+    baseline.update(smoothed_counts)
+    baseline.save(BASELINE_PATH)
+
+    today_start = pd.Timestamp.now(tz='UTC').normalize()
+    median, p25, p75 = baseline.profile(today_start)
+    typical_today = pd.DataFrame(
+        {'median': median, 'p25': p25, 'p75': p75},
+        index=pd.date_range(today_start, periods=len(median), freq='min'),
+    ).astype('float64')
+
+    # A stalled scanner leaves an old last point; it gets no current reading or forecast
+    now_minute = int(log_clock_seconds() // 60)
+    forecast = baseline.forecast(smoothed_counts, now_minute=now_minute)
+    if forecast is not None:
+        start, values, low, high = forecast
+        forecast_df = pd.DataFrame(
+            {'value': values, 'low': low, 'high': high},
+            index=pd.date_range(pd.Timestamp(start * 60, unit='s', tz='UTC'),
+                                periods=len(values), freq='min'),
+        ).astype('float64')
+    else:
+        forecast_df = None
+
+    return typical_today, forecast_df, baseline_json(baseline, smoothed_counts,
+                                                     today_start, forecast, now_minute)
+
+def restore_snapshot():
+    """Publish the warm-start snapshot's JSON payloads and charts; needs no heavy imports."""
+    snapshot = load_snapshot()
+    if snapshot is None:
+        print("No warm-start snapshot, waiting for the first update")
+        return
+
+    with cache.lock:
+        for name, payload in snapshot['payloads'].items():
+            setattr(cache, name, payload)
+        cache.snapshot_charts = snapshot['charts']
+        cache.version = snapshot['version']
+        cache.last_update = datetime.datetime.fromisoformat(snapshot['last_update'])
+    print(f"Restored warm-start snapshot from {snapshot['last_update']}")
+
+def restore_snapshot_series():
+    """Republish the snapshot's smoothed series so other chart sizes can render before the first pass."""
+    import pandas as pd
+
+    snapshot = load_snapshot()
+    if snapshot is None or not snapshot['minutes']:
+        return
+
+    index = pd.to_datetime([minute * 60 for minute in snapshot['minutes']], unit='s', utc=True)
+    smoothed_counts = pd.Series(list(snapshot['values']), index=index, dtype='float64')
+
+    with cache.lock:
+        if cache.scan_counts is None:
+            cache.scan_counts = smoothed_counts
+            # Charts drawn from this have no overlays, so keep them apart from the snapshot's
+            cache.version = snapshot['version'] + 1
+
+def write_snapshot():
+    """Save the published data and the charts for recently requested sizes."""
+    try:
+        with cache.lock:
+            scan_counts = cache.scan_counts
+            version = cache.version
+            last_update = cache.last_update
+            payloads = {name: getattr(cache, name)
+                        for name in ('manufacturer_json', 'zones_json', 'visits_json', 'baseline_json',
+                                     'stats_json')
+                        if getattr(cache, name) is not None}
+
+        # Render (and so warm the variant cache with) the default size and any in use
+        sizes = [DISPLAY_PROFILES['default']] + chart_variants.recent_sizes()
+        charts = {}
+        for width, height in dict.fromkeys(sizes):
+            charts[(width, height, 'png')] = render_chart_variant(width, height, 'png')[0]
+
+        minutes = scan_counts.index.values.astype('datetime64[m]').astype('int64')
+        save_snapshot(version, last_update.isoformat(), minutes.tolist(),
+                      scan_counts.values.tolist(), payloads, charts)
+
+    except Exception as e:
+        print(f"Error writing warm-start snapshot: {e}")
+
 def update_data():
     """Function to update the cached data."""
+    # The heavy imports happen here, off the startup path
+    import pandas as pd
+
+    # Set pandas options to minimize memory usage
+    pd.options.mode.chained_assignment = None
+
+    restore_snapshot_series()
+
     while True:
         try:
             counts_df = update_counts_csv()
 
+            # Devices that have left count as visits now, not when the next row arrives
+            flush_sessions()
+
+            # Queueing is a local file write; the spool is sent once the cache is published
+            if fleet_pusher is not None:
+                try:
+                    fleet_pusher.queue(counts_df)
+                except Exception as e:
+                    print(f"Error queueing counts for the fleet aggregator: {e}")
+
             if counts_df is not None and not counts_df.empty:
                 # Round timestamps to the nearest minute
                 counts_df['Timestamp'] = counts_df['Timestamp'].dt.floor('min')
@@ -169,20 +645,56 @@ def update_data():
                 # Debugging output
                 print(f"Data range: min={smoothed_counts.min()}, max={smoothed_counts.max()}")
 
+                # Precompute the manufacturer breakdown and its JSON payload
+                manufacturer_counts = build_manufacturer_breakdown()
+                manufacturer_json = minute_series_json(manufacturer_counts, 'manufacturers')
+
+                # Precompute the per-zone series and their JSON payload
+                zone_counts = build_zone_series()
+                zones_json = minute_series_json(zone_counts, 'zones')
+
+                # Update the daily peaks and statistics used by the chart and /stats
+                daily_peaks, stats_json = update_daily_stats(smoothed_counts, zone_counts)
+
+                # Precompute the typical band and forecast shown on the chart
+                typical_today, forecast_df, baseline_payload = update_baseline(smoothed_counts)
+
                 with cache.lock:
                     cache.scan_counts = smoothed_counts
+                    cache.manufacturer_counts = manufacturer_counts
+                    cache.manufacturer_json = manufacturer_json
+                    cache.zone_counts = zone_counts
+                    cache.zones_json = zones_json
+                    cache.visits_json = sessionizer.summary_json()
+                    cache.typical_today = typical_today
+                    cache.forecast = forecast_df
+                    cache.baseline_json = baseline_payload
+                    cache.daily_peaks = daily_peaks
+                    cache.stats_json = stats_json
                     cache.last_update = datetime.datetime.now(datetime.timezone.utc)
+                    cache.version += 1
+                    cache.snapshot_charts = {}
                     print(f"Data updated at {cache.last_update}")
 
+                write_snapshot()
+
             else:
                 # If counts_df is empty, create an empty smoothed_counts series
                 smoothed_counts = pd.Series(dtype='float64')
 
+                manufacturer_counts = pd.DataFrame(dtype='float64')
+
                 with cache.lock:
                     cache.scan_counts = smoothed_counts
+                    cache.manufacturer_counts = manufacturer_counts
+                    cache.manufacturer_json = minute_series_json(manufacturer_counts,
+                                                                 'manufacturers')
+                    cache.visits_json = sessionizer.summary_json()
                     cache.last_update = datetime.datetime.now(datetime.timezone.utc)
+                    cache.version += 1
                     print(f"Data updated at {cache.last_update} (no new data)")
 
+            start_fleet_flush()
             gc.collect()
 
         except Exception as e:
@@ -251,7 +763,7 @@ def index():
             <div class="content">
                 <h1>How many people are in the living room?</h1>
                 <p class="subtitle">15-minute average of bluetooth device count</p>
-                <img src="/chart" alt="Living Room Occupancy">
+                <img id="chart" alt="Living Room Occupancy">
             </div>
             <p class="status">Page auto-refreshes every 10 minutes</p>
             <p id="last-update" class="status"></p>
@@ -267,6 +779,12 @@ def index():
             }
             updateTimestamp();
             setInterval(updateTimestamp, 60000);
+
+            // Ask for an image sized for this screen instead of rescaling the default
+            const chart = document.getElementById('chart');
+            const ratio = window.devicePixelRatio || 1;
+            chart.src = '/chart?width=' + Math.round(chart.clientWidth * ratio) +
+                        '&height=' + Math.round(chart.clientHeight * ratio);
         </script>
     </body>
     </html>
@@ -280,163 +798,227 @@ def last_update():
 
 @app.route('/chart')
 def chart():
-    with cache.lock:
-        if cache.scan_counts is None or cache.scan_counts.empty:
-            return "Data not yet loaded", 503
+    try:
+        width, height, fmt = parse_variant(request.args)
+    except ValueError as e:
+        return str(e), 400
 
-        scan_counts = cache.scan_counts
+    # 'total' is the main estimate; zone names and 'weighted' select a zoning series
+    series = request.args.get('series', 'total')
 
     try:
-        # Print debug info
-        print(f"Plotting data with shape: {scan_counts.shape}")
-        print(f"Data range: min={scan_counts.min()}, max={scan_counts.max()}")
+        variant = render_chart_variant(width, height, fmt, series)
+    except KeyError:
+        return f"Unknown series '{series}'", 400
+    except Exception as e:
+        print(f"Error generating chart: {e}")
+        return "Error generating chart", 500
 
-        # Set dark mode style for matplotlib
-        plt.style.use('dark_background')
+    if variant is None and series == 'total':
+        # Until the first update, serve the chart from the warm-start snapshot if it
+        # has this exact size and format; anything else waits for the data
+        with cache.lock:
+            body = cache.snapshot_charts.get((width, height, fmt))
+        if body is not None:
+            variant = (body, FORMATS[fmt], content_etag(body))
+    if variant is None:
+        return "Data not yet loaded", 503
+
+    body, mimetype, etag = variant
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+def render_chart_variant(width, height, fmt, series='total'):
+    """Return (image bytes, mimetype, ETag) for a chart variant, or None before any data.
+
+    Raises KeyError for a series name that isn't 'total' or a zoning column.
+    """
+    with cache.lock:
+        if series == 'total':
+            scan_counts = cache.scan_counts
+            typical_today = cache.typical_today
+            forecast_df = cache.forecast
+        else:
+            if cache.zone_counts is None or cache.zone_counts.empty:
+                return None
+            scan_counts = cache.zone_counts[series]
+            # The baseline and forecast describe the total, so don't overlay them
+            typical_today = None
+            forecast_df = None
+        daily_peaks = cache.daily_peaks.get(series, {})
+        data_version = cache.version
+
+    if scan_counts is None or scan_counts.empty:
+        return None
 
-        # Create figure with two subplots stacked vertically
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 6.4),
-                                        dpi=100,
-                                        facecolor='#1a1a1a',
-                                        height_ratios=[1, 1])
+    import pandas as pd
+
+    # Get current time and date boundaries
+    now = pd.Timestamp.now(tz='UTC')
+    today_start = now.normalize()  # Start of today
+
+    # Peaks come precomputed from the daily statistics index
+    today = today_start.value // (86400 * 10**9)
+    yesterday_peaks, today_peaks = (
+        [(pd.Timestamp(minute * 60, unit='s', tz='UTC'), value)
+         for minute, value in daily_peaks.get(day, [])]
+        for day in (today - 1, today)
+    )
+
+    def render(renderer, render_fmt):
+        return render_chart(renderer, render_fmt, scan_counts, today_start,
+                            typical_today, forecast_df, yesterday_peaks, today_peaks)
+
+    # The same data renders differently once the day rolls over
+    data_key = (data_version, today_start.value, series)
+    body = chart_variants.get(width, height, fmt, data_key, render)
+
+    # Versions restart when there's no snapshot, so the ETag comes from the bytes themselves
+    return body, FORMATS[fmt], content_etag(body)
+
+def render_chart(renderer, fmt, scan_counts, today_start, typical_today, forecast_df,
+                 yesterday_peaks=(), today_peaks=()):
+    """Render the yesterday/today chart with the given renderer and return the image bytes."""
+    import pandas as pd
+
+    yesterday_start = (today_start - pd.Timedelta(days=1)).normalize()  # Start of yesterday (midnight)
+    tomorrow_start = (today_start + pd.Timedelta(days=1)).normalize()  # Start of tomorrow (midnight)
+
+    # Split data into yesterday and today
+    yesterday_data = scan_counts[
+        (scan_counts.index >= yesterday_start) &
+        (scan_counts.index < today_start)
+    ]
+    today_data = scan_counts[
+        (scan_counts.index >= today_start) &
+        (scan_counts.index < tomorrow_start)
+    ]
+
+    # Calculate overall maximum for consistent y-axis
+    overall_max = max(
+        yesterday_data.max() if not yesterday_data.empty else 0,
+        today_data.max() if not today_data.empty else 0,
+        typical_today['p75'].max() if typical_today is not None else 0,
+        forecast_df['high'].max() if forecast_df is not None else 0
+    )
+    overall_max = 0 if pd.isnull(overall_max) else overall_max
+    y_max = overall_max * 1.1 if overall_max > 0 else 10
+
+    return renderer.render(
+        yesterday_data, today_data,
+        yesterday_start, today_start, tomorrow_start, y_max,
+        yesterday_peaks=yesterday_peaks,
+        today_peaks=today_peaks,
+        typical=typical_today, forecast=forecast_df, fmt=fmt,
+    )
+
+def cached_json_response(name):
+    """Serve a JSON body precomputed by update_data, or 503 before the first update."""
+    with cache.lock:
+        payload = getattr(cache, name)
 
-        # Get current time and date boundaries
-        now = pd.Timestamp.now(tz='UTC')
-        today_start = now.normalize()  # Start of today
-        yesterday_start = (today_start - pd.Timedelta(days=1)).normalize()  # Start of yesterday (midnight)
-        tomorrow_start = (today_start + pd.Timedelta(days=1)).normalize()  # Start of tomorrow (midnight)
-
-        # Split data into yesterday and today
-        yesterday_data = scan_counts[
-            (scan_counts.index >= yesterday_start) &
-            (scan_counts.index < today_start)
-        ]
-        today_data = scan_counts[
-            (scan_counts.index >= today_start) &
-            (scan_counts.index < tomorrow_start)
-        ]
-
-        # Function to style and plot data on an axis
-        def style_subplot(ax, data, label, show_x_labels=True):
-            ax.set_facecolor('#1a1a1a')
-
-            # Plot filled area
-            ax.fill_between(data.index, data.values,
-                            alpha=0.2, color='#60a5fa')
-
-            # Plot the main line
-            ax.plot(data.index, data.values,
-                    color='#60a5fa',
-                    linewidth=3,
-                    solid_capstyle='round')
-
-            # Find and plot peaks
-            if not data.empty:
-                from scipy.signal import find_peaks
-                peaks, _ = find_peaks(data.values, distance=60)
-
-                if len(peaks) > 0:
-                    peak_values = data.values[peaks]
-                    peak_times = data.index[peaks]
-
-                    # Sort peaks by value and get top 2
-                    peak_indices = sorted(range(len(peak_values)),
-                                          key=lambda k: peak_values[k],
-                                          reverse=True)[:2]
-
-                    for idx in peak_indices:
-                        ax.annotate(f'{int(peak_values[idx])}',
-                                    xy=(peak_times[idx], peak_values[idx]),
-                                    xytext=(0, 10),
-                                    textcoords='offset points',
-                                    ha='center',
-                                    va='bottom',
-                                    color='white',
-                                    fontsize=12,
-                                    fontweight='bold')
-
-            # Set y-axis label
-            ax.set_ylabel(f'{label}', labelpad=10, fontsize=14,
-                          color='white', fontweight='bold')
-
-            # Format x-axis
-            ax.xaxis.set_major_formatter(
-                matplotlib.dates.DateFormatter('%-I:%M %p'))
-            ax.xaxis.set_major_locator(
-                matplotlib.dates.HourLocator(interval=3))
-
-            # Style ticks
-            if show_x_labels:
-                ax.tick_params(axis='both', which='major',
-                               labelsize=12, colors='white',
-                               labelcolor='white')
-                for lbl in ax.get_xticklabels():
-                    lbl.set_fontweight('bold')
-                    lbl.set_rotation(0)
-                    lbl.set_ha('center')  # Center the labels on the tick marks
-            else:
-                ax.tick_params(axis='x', which='both', length=0)
-                ax.set_xticklabels([])
+    if payload is None:
+        return "Data not yet loaded", 503
 
-            # Style y-axis ticks
-            ax.tick_params(axis='y', which='major',
-                           labelsize=16, colors='white',
-                           labelcolor='white')
-            for lbl in ax.get_yticklabels():
-                lbl.set_fontweight('bold')
+    # The payload is built by update_data, so serving it is just a copy
+    return Response(payload, mimetype='application/json')
 
-            # Set y-axis to show only integers
-            ax.yaxis.set_major_locator(matplotlib.ticker.MaxNLocator(integer=True))
+@app.route('/manufacturers')
+def manufacturers():
+    return cached_json_response('manufacturer_json')
 
-            # Remove grid
-            ax.grid(False)
+@app.route('/baseline')
+def baseline_view():
+    return cached_json_response('baseline_json')
 
-            # Set x-axis limits to show full day
-            if label == 'Yesterday':
-                ax.set_xlim(yesterday_start, today_start)  # Full day from midnight to midnight
-            else:
-                ax.set_xlim(today_start, tomorrow_start)  # Full day from midnight to midnight
+@app.route('/zones')
+def zones():
+    return cached_json_response('zones_json')
 
-        # Calculate overall maximum for consistent y-axis
-        overall_max = max(
-            yesterday_data.max() if not yesterday_data.empty else 0,
-            today_data.max() if not today_data.empty else 0
-        )
-        y_max = overall_max * 1.1 if overall_max > 0 else 10
+@app.route('/stats')
+def stats():
+    # 'total' is the main estimate; zone names and 'weighted' select a zoning series
+    series = request.args.get('series', 'total')
 
-        # Style both subplots
-        style_subplot(ax1, yesterday_data, 'Yesterday', show_x_labels=False)
-        style_subplot(ax2, today_data, 'Today', show_x_labels=True)
+    with cache.lock:
+        stats_json = cache.stats_json
+
+    if stats_json is None:
+        return "Data not yet loaded", 503
+    if series not in stats_json:
+        return f"Unknown series '{series}'", 400
+
+    return Response(stats_json[series], mimetype='application/json')
+
+@app.route('/rotation')
+def rotation():
+    try:
+        body, etag = rotation_manifest.get()
+    except Exception as e:
+        print(f"Error building rotation manifest: {e}")
+        return "Error building rotation manifest", 500
+
+    response = Response(body, mimetype='application/json')
+    # The rotator is served by the PHP server on another port
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    # Let the browser keep the manifest but revalidate it on every poll
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+@app.route('/export/<kind>')
+def export(kind):
+    # Streams counts, rollups or raw rows straight from the daily logs, so it
+    # never touches the cache and long exports don't hold up update_data
+    try:
+        options = parse_export_args(kind, request.args)
+    except ValueError as e:
+        return str(e), 400
+
+    mimetype = 'application/gzip' if options['gzip'] else EXPORT_FORMATS[options['format']]
+    response = Response(stream_export('logs', options), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{export_filename(options)}"'
+    return response
 
-        # Set consistent y-axis limits for both plots
-        ax1.set_ylim(bottom=0, top=y_max)
-        ax2.set_ylim(bottom=0, top=y_max)
+@app.route('/visits')
+def visits():
+    return cached_json_response('visits_json')
 
-        # Remove spacing between subplots
-        plt.subplots_adjust(hspace=0)
+@app.route('/chart/manufacturers')
+def manufacturers_chart():
+    with cache.lock:
+        if cache.manufacturer_counts is None or cache.manufacturer_counts.empty:
+            return "Data not yet loaded", 503
+
+        manufacturer_counts = cache.manufacturer_counts
+        data_version = cache.version
+
+    import pandas as pd
 
-        # Save plot
-        img = io.BytesIO()
-        plt.savefig(img, format='png',
-                    facecolor='#1a1a1a',
-                    bbox_inches='tight',
-                    pad_inches=0.2)
-        plt.close()
-        img.seek(0)
+    try:
+        # Show today only, stacked by manufacturer
+        today_start = pd.Timestamp.now(tz='UTC').normalize()
+        tomorrow_start = (today_start + pd.Timedelta(days=1)).normalize()
+        today_data = manufacturer_counts[manufacturer_counts.index >= today_start]
 
-        return send_file(img, mimetype='image/png')
+        def render(renderer, render_fmt):
+            return renderer.render(today_data, today_start, tomorrow_start, render_fmt)
 
+        width, height = DISPLAY_PROFILES['default']
+        data_key = (data_version, today_start.value)
+        body = manufacturer_chart_variants.get(width, height, 'png', data_key, render)
     except Exception as e:
-        print(f"Error generating chart: {e}")
+        print(f"Error generating manufacturer chart: {e}")
         return "Error generating chart", 500
 
-    finally:
-        plt.close('all')
-        gc.collect()
+    response = Response(body, mimetype='image/png')
+    response.set_etag(content_etag(body))
+    return response.make_conditional(request)
 
 if __name__ == '__main__':
-    # Set pandas options to minimize memory usage
-    pd.options.mode.chained_assignment = None
+    # Serve the last published data while the update thread warms up
+    restore_snapshot()
 
     # Start the update thread
     update_thread = threading.Thread(target=update_data, daemon=True)
@@ -0,0 +1,199 @@
+import json
+import os
+import warnings
+
+import numpy as np
+
+MINUTES_PER_DAY = 1440
+
+# Number of past weeks each day-of-week/minute-of-day slot remembers
+WEEKS_TO_KEEP = 8
+
+# Minutes ahead covered by the short-term forecast
+FORECAST_HORIZON = 60
+
+# Per-minute persistence of the current deviation from the typical level
+FORECAST_DECAY = 0.97
+
+# A last data point older than this (scanner stalled) gets no current reading or forecast
+MAX_CURRENT_AGE_MINUTES = 30
+
+
+class OccupancyBaseline:
+    """Day-of-week by minute-of-day occupancy profile with robust statistics.
+
+    The last WEEKS_TO_KEEP weeks of minute values live in a ring of
+    (week, day-of-week, minute) planes. Writing a minute overwrites its slot,
+    so re-feeding overlapping windows is harmless. Median and quartiles are
+    recomputed only for the days that changed and kept as small float32 arrays.
+    """
+
+    def __init__(self, weeks_to_keep=WEEKS_TO_KEEP):
+        self.weeks_to_keep = weeks_to_keep
+        self.history = np.full((weeks_to_keep, 7, MINUTES_PER_DAY), np.nan, dtype=np.float32)
+        self.week_ids = np.full(weeks_to_keep, -1, dtype=np.int64)
+        self.median = np.full((7, MINUTES_PER_DAY), np.nan, dtype=np.float32)
+        self.p25 = np.full((7, MINUTES_PER_DAY), np.nan, dtype=np.float32)
+        self.p75 = np.full((7, MINUTES_PER_DAY), np.nan, dtype=np.float32)
+
+    def update(self, series):
+        """Record a minute series (UTC DatetimeIndex) and refresh the affected days."""
+        if series is None or series.empty:
+            return
+
+        epoch_minutes = series.index.values.astype('datetime64[m]').astype(np.int64)
+        values = series.values.astype(np.float32)
+
+        days = epoch_minutes // MINUTES_PER_DAY
+        minute_of_day = epoch_minutes % MINUTES_PER_DAY
+        # The epoch fell on a Thursday; shift so Monday is 0
+        day_of_week = (days + 3) % 7
+        weeks = (days + 3) // 7
+        slots = weeks % self.weeks_to_keep
+
+        # Claim ring slots for weeks we haven't seen yet, skipping weeks too old to keep
+        keep = np.ones(len(values), dtype=bool)
+        for week in np.unique(weeks):
+            slot = week % self.weeks_to_keep
+            if self.week_ids[slot] < week:
+                self.history[slot] = np.nan
+                self.week_ids[slot] = week
+            elif self.week_ids[slot] > week:
+                keep &= weeks != week
+
+        self.history[slots[keep], day_of_week[keep], minute_of_day[keep]] = values[keep]
+
+        for dow in np.unique(day_of_week[keep]):
+            self._refresh(dow)
+
+    def _refresh(self, dow):
+        with warnings.catch_warnings():
+            # Minutes with no history at all are expected and stay NaN
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            p25, median, p75 = np.nanpercentile(self.history[:, dow, :], [25, 50, 75], axis=0)
+        self.p25[dow] = p25
+        self.median[dow] = median
+        self.p75[dow] = p75
+
+    def profile(self, day_start):
+        """Typical (median, p25, p75) arrays for the day starting at `day_start`."""
+        dow = int((day_start.value // 86_400_000_000_000 + 3) % 7)
+        return self.median[dow], self.p25[dow], self.p75[dow]
+
+    def typical_at(self, epoch_minute):
+        """Typical (median, p25, p75) for one minute, on that minute's own day of the week."""
+        dow = (epoch_minute // MINUTES_PER_DAY + 3) % 7
+        minute_of_day = epoch_minute % MINUTES_PER_DAY
+        return (self.median[dow, minute_of_day], self.p25[dow, minute_of_day],
+                self.p75[dow, minute_of_day])
+
+    def forecast(self, series, horizon=FORECAST_HORIZON, decay=FORECAST_DECAY, now_minute=None):
+        """Forecast the next `horizon` minutes after the last point of `series`.
+
+        The current deviation from the typical level decays geometrically back to
+        the median profile. Returns (start, values, low, high) or None when there
+        is no baseline for the minutes involved, or when the last point is more
+        than MAX_CURRENT_AGE_MINUTES before `now_minute` (epoch minutes).
+        """
+        if series is None or series.empty:
+            return None
+
+        last_minute = int(series.index[-1].value // 60_000_000_000)
+        if _is_stale(last_minute, now_minute):
+            return None
+        future = last_minute + 1 + np.arange(horizon)
+        day_of_week = ((future // MINUTES_PER_DAY) + 3) % 7
+        minute_of_day = future % MINUTES_PER_DAY
+
+        now_typical = self.typical_at(last_minute)[0]
+        if np.isnan(now_typical):
+            return None
+
+        deviation = float(series.values[-1]) - float(now_typical)
+        weights = decay ** np.arange(1, horizon + 1)
+        shift = (deviation * weights).astype(np.float32)
+
+        # Where the future minutes have no history yet, fall back to persistence
+        median = self.median[day_of_week, minute_of_day]
+        typical = np.where(np.isnan(median), now_typical, median)
+        p25 = np.where(np.isnan(median), typical, self.p25[day_of_week, minute_of_day])
+        p75 = np.where(np.isnan(median), typical, self.p75[day_of_week, minute_of_day])
+
+        values = np.clip(typical + shift, 0, None)
+        low = np.clip(p25 + shift, 0, None)
+        high = np.clip(p75 + shift, 0, None)
+        return last_minute + 1, values, low, high
+
+    def save(self, path):
+        """Persist the ring so the baseline survives restarts."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, history=self.history, week_ids=self.week_ids)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, weeks_to_keep=WEEKS_TO_KEEP):
+        """Load a saved baseline, or start empty if there is none."""
+        baseline = cls(weeks_to_keep)
+        if not os.path.exists(path):
+            return baseline
+        try:
+            with np.load(path) as data:
+                if data['history'].shape == baseline.history.shape:
+                    baseline.history = data['history']
+                    baseline.week_ids = data['week_ids']
+            for dow in range(7):
+                baseline._refresh(dow)
+        except Exception as e:
+            print(f"Error loading baseline from {path}: {e}")
+        return baseline
+
+
+def _is_stale(last_minute, now_minute):
+    return now_minute is not None and now_minute - last_minute > MAX_CURRENT_AGE_MINUTES
+
+
+def baseline_json(baseline, series, day_start, forecast, now_minute=None):
+    """Serialize today's typical band and the forecast for /baseline.
+
+    The current reading is compared with the profile of its own day, and is
+    left out when it's older than MAX_CURRENT_AGE_MINUTES before `now_minute`.
+    """
+    median, p25, p75 = baseline.profile(day_start)
+
+    def as_list(values):
+        return [None if np.isnan(v) else round(float(v), 1) for v in values]
+
+    payload = {
+        'day_start': day_start.isoformat(),
+        'step_minutes': 1,
+        'typical': {'median': as_list(median), 'p25': as_list(p25), 'p75': as_list(p75)},
+        'current': None,
+        'forecast': None,
+    }
+
+    last_minute = None
+    if series is not None and not series.empty:
+        last_minute = int(series.index[-1].value // 60_000_000_000)
+    if last_minute is not None and not _is_stale(last_minute, now_minute):
+        # Just after midnight the last point can still be yesterday's
+        current = float(series.values[-1])
+        typical, _, typical_p75 = baseline.typical_at(last_minute)
+        payload['current'] = {
+            'timestamp': series.index[-1].isoformat(),
+            'value': round(current, 1),
+            'typical': None if np.isnan(typical) else round(float(typical), 1),
+            'busier_than_usual': bool(not np.isnan(typical_p75) and current > typical_p75),
+        }
+
+    if forecast is not None:
+        start, values, low, high = forecast
+        payload['forecast'] = {
+            'start': np.datetime64(start, 'm').astype('datetime64[s]').item().isoformat() + '+00:00',
+            'step_minutes': 1,
+            'values': as_list(values),
+            'low': as_list(low),
+            'high': as_list(high),
+        }
+
+    return json.dumps(payload)
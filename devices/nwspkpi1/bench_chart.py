@@ -0,0 +1,187 @@
+"""Compare per-render time and allocations of the /chart renderers.
+
+The legacy path is the original chart() body: new pyplot subplots and styling
+on every request, peak finding on every render, bbox_inches='tight', then
+plt.close('all') and gc.collect(). Peaks come from scipy's find_peaks as they
+did originally when scipy is installed; the app no longer needs it, so without
+it the bench uses daily_stats.top_peaks, which picks the same peaks.
+The persistent path reuses one ChartRenderer and only swaps its data, with the
+peaks computed once up front as the daily statistics index provides them.
+
+    python bench_chart.py [renders]
+"""
+import gc
+import io
+import sys
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from chart_renderer import ChartRenderer  # noqa: E402
+from daily_stats import top_peaks  # noqa: E402
+
+
+def synthetic_counts():
+    """48 hours of minute data shaped like a day in the living room."""
+    end = pd.Timestamp.now(tz='UTC').floor('min')
+    index = pd.date_range(end - pd.Timedelta(hours=48), end, freq='min')
+    hours = index.hour + index.minute / 60
+    rng = np.random.default_rng(0)
+    values = np.floor(6 + 5 * np.sin((hours - 9) / 24 * 2 * np.pi) + rng.normal(0, 0.5, len(index)))
+    return pd.Series(np.clip(values, 0, None), index=index, dtype='float64')
+
+
+try:
+    from scipy.signal import find_peaks
+except ImportError:
+    find_peaks = None
+
+
+def find_top_peaks(data, count=2):
+    """The original app.find_top_peaks, run on every legacy render."""
+    if data.empty:
+        return []
+    if find_peaks is None:
+        return precomputed_peaks(data, count)
+
+    peaks, _ = find_peaks(data.values, distance=60)
+
+    # Sort peaks by value and get the top ones
+    top = sorted(peaks, key=lambda k: data.values[k], reverse=True)[:count]
+    return [(data.index[k], data.values[k]) for k in top]
+
+
+def precomputed_peaks(data, count=2):
+    """(timestamp, value) of the highest peaks as daily_stats picks them; the series has no gaps."""
+    return [(data.index[k], value) for k, value in top_peaks(data.values, count)]
+
+
+def day_bounds():
+    today_start = pd.Timestamp.now(tz='UTC').normalize()
+    return (today_start - pd.Timedelta(days=1), today_start,
+            today_start + pd.Timedelta(days=1))
+
+
+def legacy_render(scan_counts):
+    yesterday_start, today_start, tomorrow_start = day_bounds()
+    try:
+        plt.style.use('dark_background')
+        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 6.4), dpi=100,
+                                       facecolor='#1a1a1a', height_ratios=[1, 1])
+        yesterday_data = scan_counts[(scan_counts.index >= yesterday_start) &
+                                     (scan_counts.index < today_start)]
+        today_data = scan_counts[(scan_counts.index >= today_start) &
+                                 (scan_counts.index < tomorrow_start)]
+
+        def style_subplot(ax, data, label, show_x_labels=True):
+            ax.set_facecolor('#1a1a1a')
+            ax.fill_between(data.index, data.values, alpha=0.2, color='#60a5fa')
+            ax.plot(data.index, data.values, color='#60a5fa', linewidth=3,
+                    solid_capstyle='round')
+            for peak_time, peak_value in find_top_peaks(data):
+                ax.annotate(f'{int(peak_value)}', xy=(peak_time, peak_value),
+                            xytext=(0, 10), textcoords='offset points', ha='center',
+                            va='bottom', color='white', fontsize=12, fontweight='bold')
+            ax.set_ylabel(label, labelpad=10, fontsize=14, color='white', fontweight='bold')
+            ax.xaxis.set_major_formatter(matplotlib.dates.DateFormatter('%-I:%M %p'))
+            ax.xaxis.set_major_locator(matplotlib.dates.HourLocator(interval=3))
+            if show_x_labels:
+                ax.tick_params(axis='both', which='major', labelsize=12,
+                               colors='white', labelcolor='white')
+                for lbl in ax.get_xticklabels():
+                    lbl.set_fontweight('bold')
+                    lbl.set_rotation(0)
+                    lbl.set_ha('center')
+            else:
+                ax.tick_params(axis='x', which='both', length=0)
+                ax.set_xticklabels([])
+            ax.tick_params(axis='y', which='major', labelsize=16,
+                           colors='white', labelcolor='white')
+            for lbl in ax.get_yticklabels():
+                lbl.set_fontweight('bold')
+            ax.yaxis.set_major_locator(matplotlib.ticker.MaxNLocator(integer=True))
+            ax.grid(False)
+            if label == 'Yesterday':
+                ax.set_xlim(yesterday_start, today_start)
+            else:
+                ax.set_xlim(today_start, tomorrow_start)
+
+        overall_max = max(yesterday_data.max() if not yesterday_data.empty else 0,
+                          today_data.max() if not today_data.empty else 0)
+        y_max = overall_max * 1.1 if overall_max > 0 else 10
+        style_subplot(ax1, yesterday_data, 'Yesterday', show_x_labels=False)
+        style_subplot(ax2, today_data, 'Today', show_x_labels=True)
+        ax1.set_ylim(bottom=0, top=y_max)
+        ax2.set_ylim(bottom=0, top=y_max)
+        plt.subplots_adjust(hspace=0)
+
+        img = io.BytesIO()
+        plt.savefig(img, format='png', facecolor='#1a1a1a',
+                    bbox_inches='tight', pad_inches=0.2)
+        plt.close()
+        return img.getvalue()
+    finally:
+        plt.close('all')
+        gc.collect()
+
+
+def persistent_render(renderer, scan_counts, peaks):
+    yesterday_start, today_start, tomorrow_start = day_bounds()
+    yesterday_data = scan_counts[(scan_counts.index >= yesterday_start) &
+                                 (scan_counts.index < today_start)]
+    today_data = scan_counts[(scan_counts.index >= today_start) &
+                             (scan_counts.index < tomorrow_start)]
+    overall_max = max(yesterday_data.max() if not yesterday_data.empty else 0,
+                      today_data.max() if not today_data.empty else 0)
+    y_max = overall_max * 1.1 if overall_max > 0 else 10
+    return renderer.render(yesterday_data, today_data, yesterday_start, today_start,
+                           tomorrow_start, y_max,
+                           yesterday_peaks=peaks[0], today_peaks=peaks[1])
+
+
+def measure(name, render, renders):
+    # Warm up imports, font caches and the renderer's first draw
+    render()
+
+    times = []
+    for _ in range(renders):
+        started = time.perf_counter()
+        render()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    render()
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot_blocks = sum(stat.count for stat in
+                          tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+
+    print(f"{name:>10}: median {np.median(times) * 1000:7.1f} ms, "
+          f"min {min(times) * 1000:7.1f} ms, peak alloc {peak / 1024:8.0f} KiB, "
+          f"blocks retained {snapshot_blocks}")
+
+
+def main():
+    renders = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    scan_counts = synthetic_counts()
+    renderer = ChartRenderer()
+
+    # The app's update thread keeps these in the statistics index, so they aren't part of a render
+    yesterday_start, today_start, tomorrow_start = day_bounds()
+    peaks = (precomputed_peaks(scan_counts[(scan_counts.index >= yesterday_start) &
+                                           (scan_counts.index < today_start)]),
+             precomputed_peaks(scan_counts[scan_counts.index >= today_start]))
+
+    if find_peaks is None:
+        print("scipy not installed; the legacy path finds peaks with daily_stats.top_peaks")
+    measure('legacy', lambda: legacy_render(scan_counts), renders)
+    measure('persistent', lambda: persistent_render(renderer, scan_counts, peaks), renders)
+
+
+if __name__ == '__main__':
+    main()
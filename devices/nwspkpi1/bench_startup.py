@@ -0,0 +1,56 @@
+"""Time from process start to the first successful /chart response.
+
+Runs the app in a fresh interpreter, once with the warm-start snapshot and
+once with an empty snapshot directory, and polls /chart through the test
+client until it returns 200. Run it from the device directory so the real
+counts.csv and logs are used.
+
+    python bench_startup.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+PROBE = r'''
+import time
+started = time.perf_counter()
+import sys
+import threading
+import app
+
+app.restore_snapshot()
+threading.Thread(target=app.update_data, daemon=True).start()
+client = app.app.test_client()
+while True:
+    response = client.get('/chart')
+    if response.status_code == 200:
+        break
+    time.sleep(0.05)
+elapsed = time.perf_counter() - started
+heavy = [name for name in ('pandas', 'matplotlib', 'scipy') if name in sys.modules]
+print(f"RESULT {elapsed:.2f} {','.join(heavy) or '-'}")
+'''
+
+
+def run(label, env):
+    result = subprocess.run([sys.executable, '-c', PROBE], env=env, capture_output=True,
+                            text=True, cwd=os.path.dirname(os.path.abspath(__file__)) or '.')
+    lines = [line for line in result.stdout.splitlines() if line.startswith('RESULT')]
+    if not lines:
+        print(f"{label:>14}: failed\n{result.stderr[-2000:]}")
+        return
+    _, elapsed, heavy = lines[-1].split()
+    print(f"{label:>14}: first /chart 200 after {elapsed} s (heavy modules loaded: {heavy})")
+
+
+def main():
+    env = dict(os.environ)
+    run('warm snapshot', env)
+
+    with tempfile.TemporaryDirectory() as empty:
+        run('cold start', dict(env, SNAPSHOT_DIR=empty))
+
+
+if __name__ == '__main__':
+    main()
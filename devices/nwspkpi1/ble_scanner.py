@@ -8,7 +8,8 @@ from pathlib import Path
 from datetime import datetime
 
 import pandas as pd
-from bluepy.btle import Scanner, DefaultDelegate
+
+from sessions import SESSION_GAP_SECONDS
 
 # Configure logging
 logging.basicConfig(
@@ -16,6 +17,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+LOGS_DIR = Path('/home/nwspkpi1/telescreen/devices/nwspkpi1/logs')
+
+# Bounds on the time between scan starts in --adaptive mode, in seconds. Sightings
+# land a little further apart than the interval (timestamps are truncated and
+# sleeps overrun), so the longest interval stays well inside the sessionizer's gap;
+# otherwise a device that never left would be split into a visit per scan.
+MIN_SCAN_INTERVAL = 30.0
+MAX_SCAN_INTERVAL = 0.8 * SESSION_GAP_SECONDS
+
+# Jaccard similarity between consecutive device sets at or above which the room
+# counts as stable, and at or below which it counts as churning
+STABLE_SIMILARITY = 0.8
+CHURN_SIMILARITY = 0.5
+
+# How the interval changes after a stable or churning scan
+INTERVAL_GROWTH = 1.5
+INTERVAL_SHRINK = 0.5
+
 def load_manufacturer_data(file_path):
     """Load Bluetooth manufacturer data from a CSV file into a dictionary."""
     try:
@@ -54,10 +73,10 @@ def get_manufacturer_name(raw_data_hex, manufacturer_dict):
             return "Unknown"
     return "Unknown"
 
-def initialize_csv_file():
+def initialize_csv_file(logs_dir=LOGS_DIR, today=None):
     """Initialize the CSV file with headers if it doesn't exist."""
-    today = datetime.now().strftime('%Y-%m-%d')
-    logs_dir = Path('/home/nwspkpi1/telescreen/devices/nwspkpi1/logs')
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    logs_dir = Path(logs_dir)
     logs_dir.mkdir(parents=True, exist_ok=True)
     
     filename = logs_dir / f'ble_log_{today}.csv'
@@ -70,11 +89,78 @@ def initialize_csv_file():
             ])
     return filename
 
+def initialize_scan_log_file(logs_dir=LOGS_DIR, today=None):
+    """Initialize the per-scan sidecar CSV, which records when scans ran and at what rate."""
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    logs_dir = Path(logs_dir)
+    logs_dir.mkdir(parents=True, exist_ok=True)
+
+    # app.py counts these rows per minute to turn detections into devices per scan
+    filename = logs_dir / f'scans_{today}.csv'
+    if not filename.exists():
+        with open(filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow([
+                "Timestamp", "Devices", "Scan Duration",
+                "Interval", "Scans Per Minute", "Similarity"
+            ])
+    return filename
+
+
+def jaccard_similarity(previous, current):
+    """Overlap of two device sets; two empty sets are identical."""
+    if not previous and not current:
+        return 1.0
+    return len(previous & current) / len(previous | current)
+
+
+class AdaptiveScheduler:
+    """Choose the time between scans from how much the device set changes.
+
+    Each scan's MACs are compared with the previous scan's. A stable room
+    stretches the interval by INTERVAL_GROWTH, a churning one cuts it by
+    INTERVAL_SHRINK, and anything in between leaves it alone, always within
+    [min_interval, max_interval]. The interval runs from one scan's start to
+    the next, so it is never shorter than the scan itself.
+    """
 
-def scan_ble_devices(scanner, rssi_threshold, scan_duration, manufacturer_dict):
+    def __init__(self, scan_duration, initial_interval,
+                 min_interval=MIN_SCAN_INTERVAL, max_interval=MAX_SCAN_INTERVAL,
+                 stable_similarity=STABLE_SIMILARITY, churn_similarity=CHURN_SIMILARITY):
+        self.scan_duration = scan_duration
+        self.min_interval = max(min_interval, scan_duration)
+        self.max_interval = max(max_interval, self.min_interval)
+        self.stable_similarity = stable_similarity
+        self.churn_similarity = churn_similarity
+        self.interval = self._clamp(initial_interval)
+        self.previous = None
+        self.similarity = None
+
+    def _clamp(self, interval):
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    @property
+    def scans_per_minute(self):
+        return 60.0 / self.interval
+
+    def observe(self, devices):
+        """Record one scan's set of MACs and return the interval until the next scan."""
+        devices = set(devices)
+        if self.previous is not None:
+            self.similarity = jaccard_similarity(self.previous, devices)
+            if self.similarity >= self.stable_similarity:
+                self.interval = self._clamp(self.interval * INTERVAL_GROWTH)
+            elif self.similarity <= self.churn_similarity:
+                self.interval = self._clamp(self.interval * INTERVAL_SHRINK)
+        self.previous = devices
+        return self.interval
+
+
+def scan_ble_devices(scanner, rssi_threshold, scan_duration, manufacturer_dict, now=datetime.now):
+    """Run one scan; returns its timestamp and the rows for devices above the threshold."""
     logger.info(f"Starting {scan_duration}-second BLE scan...")
     devices = scanner.scan(scan_duration)
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    timestamp = now().strftime('%Y-%m-%d %H:%M:%S')
     detected_devices = []
 
     for dev in devices:
@@ -103,7 +189,51 @@ def scan_ble_devices(scanner, rssi_threshold, scan_duration, manufacturer_dict):
                 ])
             except Exception as e:
                 logger.error(f"Error processing device {dev.addr}: {e}")
-    return detected_devices
+    return timestamp, detected_devices
+
+def log_scan(timestamp, detected_devices, scan_duration, interval, similarity, logs_dir=LOGS_DIR):
+    """Append a scan's device rows to the daily log and its sampling rate to the sidecar."""
+    # Both go in the files for the day the scan ran, even if that was just before midnight
+    today = timestamp[:10]
+    with open(initialize_csv_file(logs_dir, today), "a", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerows(detected_devices)
+
+    with open(initialize_scan_log_file(logs_dir, today), "a", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            timestamp, len(detected_devices), scan_duration, round(interval, 1),
+            round(60.0 / interval, 3), "" if similarity is None else round(similarity, 3)
+        ])
+
+def run_adaptive(scanner, scheduler, rssi_threshold, manufacturer_dict,
+                 logs_dir=LOGS_DIR, sleep=time.sleep, clock=time.monotonic, now=datetime.now,
+                 max_scans=None):
+    """Scan in a loop, spacing scans by the scheduler's interval.
+
+    scanner, sleep, clock and now (which timestamps the logs) can be swapped
+    for simulated ones.
+    """
+    scans = 0
+    while max_scans is None or scans < max_scans:
+        started = clock()
+        try:
+            timestamp, detected_devices = scan_ble_devices(
+                scanner, rssi_threshold, scheduler.scan_duration, manufacturer_dict, now
+            )
+            interval = scheduler.observe(row[1] for row in detected_devices)
+            log_scan(timestamp, detected_devices, scheduler.scan_duration,
+                     interval, scheduler.similarity, logs_dir)
+            logger.info(
+                f"[{timestamp}] Detected {len(detected_devices)} devices "
+                f"with RSSI >= {rssi_threshold} dBm; next scan in {interval:.0f}s"
+            )
+        except Exception as e:
+            logger.error(f"An error occurred: {e}")
+            interval = scheduler.interval
+
+        scans += 1
+        sleep(max(0.0, interval - (clock() - started)))
 
 def main():
     parser = argparse.ArgumentParser(description='BLE Scanner and Logger')
@@ -120,25 +250,43 @@ def main():
                         help='Duration of each BLE scan in seconds.')
     parser.add_argument('--sleep_duration', type=float, default=60.0,
                         help='Time between scans in seconds.')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Keep scanning, adapting the time between scans to how much the room changes.')
+    parser.add_argument('--min_interval', type=float, default=MIN_SCAN_INTERVAL,
+                        help='Shortest time between scan starts in --adaptive mode, in seconds.')
+    parser.add_argument('--max_interval', type=float, default=MAX_SCAN_INTERVAL,
+                        help='Longest time between scan starts in --adaptive mode, in seconds.')
     args = parser.parse_args()
+
+    # Imported here so the scheduler can be simulated without bluepy installed
+    from bluepy.btle import Scanner, DefaultDelegate
     
     manufacturer_dict = load_manufacturer_data(args.manufacturer_file)
     if not manufacturer_dict:
         logger.warning("Manufacturer dictionary is empty. Manufacturer names will not be available.")
     
-    output_file = initialize_csv_file()
-
     scanner = Scanner().withDelegate(DefaultDelegate())
 
+    if args.adaptive:
+        if args.max_interval > MAX_SCAN_INTERVAL:
+            logger.warning(f"--max_interval {args.max_interval:.0f}s is too close to the "
+                           f"{SESSION_GAP_SECONDS}s visit gap; using {MAX_SCAN_INTERVAL:.0f}s")
+            args.max_interval = MAX_SCAN_INTERVAL
+        scheduler = AdaptiveScheduler(
+            args.scan_duration, args.scan_duration + args.sleep_duration,
+            min_interval=args.min_interval, max_interval=args.max_interval
+        )
+        run_adaptive(scanner, scheduler, args.rssi_threshold, manufacturer_dict)
+        return
+
     try:
-        detected_devices = scan_ble_devices(
+        timestamp, detected_devices = scan_ble_devices(
             scanner, args.rssi_threshold,
             args.scan_duration, manufacturer_dict
         )
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        with open(output_file, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerows(detected_devices)
+        # A single scan; the interval is whatever runs this script again
+        log_scan(timestamp, detected_devices, args.scan_duration,
+                 args.scan_duration + args.sleep_duration, None)
         logger.info(
             f"[{timestamp}] Detected {len(detected_devices)} devices "
             f"with RSSI >= {args.rssi_threshold} dBm"
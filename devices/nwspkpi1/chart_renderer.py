@@ -0,0 +1,231 @@
+import io
+import threading
+
+import matplotlib
+import matplotlib.dates as mdates
+import matplotlib.style
+import matplotlib.ticker
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+BACKGROUND_COLOR = '#1a1a1a'
+LINE_COLOR = '#60a5fa'
+TYPICAL_COLOR = '#a3a3a3'
+FORECAST_COLOR = '#fbbf24'
+
+# Number of peak labels per panel
+PEAK_LABELS = 2
+
+# Fixed margins replace bbox_inches='tight', which re-measures every text on each save
+LAYOUT = dict(left=0.07, right=0.96, top=0.96, bottom=0.08, hspace=0)
+STACK_LAYOUT = dict(left=0.07, right=0.96, top=0.96, bottom=0.08)
+
+# Matplotlib styles are global state; only build one figure at a time
+_build_lock = threading.Lock()
+
+
+def _band_verts(x, low, high):
+    """Polygons filling between `low` and `high`, split wherever either is NaN."""
+    valid = ~(np.isnan(low) | np.isnan(high))
+    if not valid.any():
+        return []
+
+    # Start and end indices of each run of valid points
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], valid.astype(np.int8), [0]))))
+    polygons = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        xs = x[start:end]
+        top = np.column_stack((xs, high[start:end]))
+        bottom = np.column_stack((xs[::-1], low[start:end][::-1]))
+        polygons.append(np.concatenate((top, bottom)))
+    return polygons
+
+
+def _date_nums(index):
+    return mdates.date2num(index.values)
+
+
+class ChartPanel:
+    """Artists for one day's panel, created once and updated in place."""
+
+    def __init__(self, ax, label, show_x_labels):
+        self.ax = ax
+        ax.set_facecolor(BACKGROUND_COLOR)
+        ax.xaxis.axis_date(tz='UTC')
+
+        self.fill = ax.fill_between([], [], alpha=0.2, color=LINE_COLOR)
+        self.line, = ax.plot([], [], color=LINE_COLOR, linewidth=3,
+                             solid_capstyle='round')
+        self.typical = ax.fill_between([], [], alpha=0.15, color=TYPICAL_COLOR,
+                                       linewidth=0)
+        self.forecast_band = ax.fill_between([], [], alpha=0.2, color=FORECAST_COLOR,
+                                             linewidth=0)
+        self.forecast_line, = ax.plot([], [], color=FORECAST_COLOR, linewidth=2,
+                                      linestyle='--')
+        self.peak_labels = [
+            ax.annotate('', xy=(0, 0), xytext=(0, 10), textcoords='offset points',
+                        ha='center', va='bottom', color='white',
+                        fontsize=12, fontweight='bold', visible=False)
+            for _ in range(PEAK_LABELS)
+        ]
+
+        ax.set_ylabel(label, labelpad=10, fontsize=14,
+                      color='white', fontweight='bold')
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%-I:%M %p', tz='UTC'))
+
+        if show_x_labels:
+            ax.tick_params(axis='x', which='major', labelsize=12,
+                           colors='white', labelcolor='white')
+        else:
+            ax.tick_params(axis='x', which='both', length=0, labelbottom=False)
+        ax.tick_params(axis='y', which='major', labelsize=16,
+                       colors='white', labelcolor='white')
+        ax.grid(False)
+
+    def update(self, data, day_start, day_end, y_ticks, y_max,
+               peaks=(), typical=None, forecast=None):
+        x = _date_nums(data.index)
+        y = data.values.astype(np.float64)
+
+        self.line.set_data(x, y)
+        self.fill.set_verts(_band_verts(x, np.zeros_like(y), y))
+
+        if typical is not None:
+            tx = _date_nums(typical.index)
+            self.typical.set_verts(_band_verts(tx, typical['p25'].values,
+                                               typical['p75'].values))
+        else:
+            self.typical.set_verts([])
+
+        if forecast is not None:
+            fx = _date_nums(forecast.index)
+            self.forecast_band.set_verts(_band_verts(fx, forecast['low'].values,
+                                                     forecast['high'].values))
+            self.forecast_line.set_data(fx, forecast['value'].values)
+        else:
+            self.forecast_band.set_verts([])
+            self.forecast_line.set_data([], [])
+
+        for label, peak in zip(self.peak_labels, list(peaks) + [None] * PEAK_LABELS):
+            if peak is None:
+                label.set_visible(False)
+                continue
+            peak_time, peak_value = peak
+            label.xy = (mdates.date2num(peak_time.to_datetime64()), peak_value)
+            label.set_text(f'{int(peak_value)}')
+            label.set_visible(True)
+
+        # Three-hourly ticks across the day; always nine, so tick artists are reused
+        x_start, x_end = mdates.date2num(np.array([day_start.value, day_end.value],
+                                                  dtype='datetime64[ns]'))
+        self.ax.set_xticks(np.linspace(x_start, x_end, 9))
+        self.ax.set_yticks(y_ticks)
+        self.ax.set_xlim(x_start, x_end)
+        self.ax.set_ylim(0, y_max)
+
+        # New tick labels pick up colour and size from tick_params, but not the weight
+        for lbl in self.ax.get_xticklabels() + self.ax.get_yticklabels():
+            lbl.set_fontweight('bold')
+
+
+class ChartRenderer:
+    """Two-panel (yesterday/today) occupancy chart built once and re-rendered in place.
+
+    Styling, subplots and artists are created in __init__. render() swaps line
+    data, fill geometry, peak labels, limits and ticks, then draws with a fixed
+    layout. A lock serializes renders, since the figure is shared.
+    """
+
+    def __init__(self, figsize=(12, 6.4), dpi=100):
+        self.lock = threading.Lock()
+        with _build_lock, matplotlib.style.context('dark_background'):
+            self.figure = Figure(figsize=figsize, dpi=dpi, facecolor=BACKGROUND_COLOR)
+            FigureCanvasAgg(self.figure)
+            ax1, ax2 = self.figure.subplots(2, 1, height_ratios=[1, 1])
+            self.figure.subplots_adjust(**LAYOUT)
+            self.yesterday = ChartPanel(ax1, 'Yesterday', show_x_labels=False)
+            self.today = ChartPanel(ax2, 'Today', show_x_labels=True)
+        self.y_locator = matplotlib.ticker.MaxNLocator(integer=True)
+
+    def render(self, yesterday_data, today_data, yesterday_start, today_start,
+               tomorrow_start, y_max, yesterday_peaks=(), today_peaks=(),
+               typical=None, forecast=None, fmt='png'):
+        """Update the figure with new data and return the encoded image bytes."""
+        y_ticks = [tick for tick in self.y_locator.tick_values(0, y_max) if 0 <= tick <= y_max]
+
+        with self.lock:
+            self.yesterday.update(yesterday_data, yesterday_start, today_start,
+                                  y_ticks, y_max, peaks=yesterday_peaks)
+            self.today.update(today_data, today_start, tomorrow_start,
+                              y_ticks, y_max, peaks=today_peaks,
+                              typical=typical, forecast=forecast)
+
+            img = io.BytesIO()
+            self.figure.savefig(img, format=fmt, facecolor=BACKGROUND_COLOR)
+            return img.getvalue()
+
+
+class StackChartRenderer:
+    """Single-panel stacked chart of today's counts by category, built once and re-rendered in place.
+
+    Used for /chart/manufacturers. The stack polygons depend on the number of
+    categories, so they're replaced on each render; the figure, axes and
+    styling are not.
+    """
+
+    def __init__(self, figsize=(12, 6.4), dpi=100):
+        self.lock = threading.Lock()
+        with _build_lock, matplotlib.style.context('dark_background'):
+            self.figure = Figure(figsize=figsize, dpi=dpi, facecolor=BACKGROUND_COLOR)
+            FigureCanvasAgg(self.figure)
+            self.ax = self.figure.subplots()
+            self.figure.subplots_adjust(**STACK_LAYOUT)
+            # Fixed colours, so a category keeps its colour from one render to the next
+            self.colors = matplotlib.rcParams['axes.prop_cycle'].by_key()['color']
+
+            ax = self.ax
+            ax.set_facecolor(BACKGROUND_COLOR)
+            ax.xaxis.axis_date(tz='UTC')
+            ax.set_ylabel('Today', labelpad=10, fontsize=14,
+                          color='white', fontweight='bold')
+            ax.xaxis.set_major_formatter(mdates.DateFormatter('%-I:%M %p', tz='UTC'))
+            ax.tick_params(axis='both', which='major', labelsize=12,
+                           colors='white', labelcolor='white')
+            ax.grid(False)
+        self.stacks = []
+        self.y_locator = matplotlib.ticker.MaxNLocator(integer=True)
+
+    def render(self, data, day_start, day_end, fmt='png'):
+        """Draw `data` (one column per category) stacked over the day and return the image bytes."""
+        with self.lock:
+            for artist in self.stacks:
+                artist.remove()
+            self.stacks = []
+            legend = self.ax.get_legend()
+            if legend is not None:
+                legend.remove()
+
+            y_max = 10
+            if not data.empty:
+                colors = [self.colors[i % len(self.colors)] for i in range(len(data.columns))]
+                self.stacks = self.ax.stackplot(
+                    _date_nums(data.index),
+                    [data[name].values.astype(np.float64) for name in data.columns],
+                    labels=[str(name) for name in data.columns], colors=colors, alpha=0.8)
+                self.ax.legend(loc='upper left', fontsize=12, frameon=False, labelcolor='white')
+                top = float(np.nanmax(data.sum(axis=1).values))
+                if top > 0:
+                    y_max = top * 1.1
+
+            x_start, x_end = mdates.date2num(np.array([day_start.value, day_end.value],
+                                                      dtype='datetime64[ns]'))
+            self.ax.set_xticks(np.linspace(x_start, x_end, 9))
+            self.ax.set_yticks([tick for tick in self.y_locator.tick_values(0, y_max)
+                                if 0 <= tick <= y_max])
+            self.ax.set_xlim(x_start, x_end)
+            self.ax.set_ylim(0, y_max)
+
+            img = io.BytesIO()
+            self.figure.savefig(img, format=fmt, facecolor=BACKGROUND_COLOR)
+            return img.getvalue()
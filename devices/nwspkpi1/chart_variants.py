@@ -0,0 +1,182 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+# Named displays around the house, in pixels
+DISPLAY_PROFILES = {
+    'default': (1200, 640),
+    'side': (800, 480),
+    'tablet': (1280, 800),
+    'tv': (1920, 1080),
+    'tv-4k': (3840, 2160),
+}
+
+FORMATS = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'svg': 'image/svg+xml',
+}
+
+# The figure is always 12 inches wide; DPI scales it to the requested width so
+# fonts and margins keep the same proportions on every display
+FIGURE_WIDTH_INCHES = 12
+
+# Free-form sizes are rounded to this many pixels to bound the number of variants
+SIZE_STEP = 80
+MIN_WIDTH, MAX_WIDTH = 320, 3840
+MIN_HEIGHT, MAX_HEIGHT = 240, 2160
+
+# Colours kept in palette PNGs; the dark theme only uses a handful plus antialiasing
+PALETTE_COLORS = 64
+
+# Total bytes of encoded images kept in the variant cache
+VARIANT_CACHE_BYTES = 8 * 1024 * 1024
+
+# Renderers are a figure each, holding an RGBA Agg buffer of 4 bytes per pixel,
+# so the sizes kept around are capped by total pixels (about 40 MB of buffers).
+# A tv-4k figure alone is 8.3 million pixels.
+RENDERER_PIXELS = 10_000_000
+
+
+def parse_variant(args):
+    """Resolve request args to (width, height, fmt), raising ValueError if invalid."""
+    profile = args.get('profile')
+    if profile is not None:
+        if profile not in DISPLAY_PROFILES:
+            raise ValueError(f"Unknown display profile '{profile}'")
+        width, height = DISPLAY_PROFILES[profile]
+    else:
+        default_width, default_height = DISPLAY_PROFILES['default']
+        try:
+            width = int(args.get('width', default_width))
+            height = int(args.get('height', default_height))
+        except ValueError:
+            raise ValueError("width and height must be integers")
+        width = min(max(round(width / SIZE_STEP) * SIZE_STEP, MIN_WIDTH), MAX_WIDTH)
+        height = min(max(round(height / SIZE_STEP) * SIZE_STEP, MIN_HEIGHT), MAX_HEIGHT)
+
+    fmt = args.get('format', 'png').lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}'")
+    return width, height, fmt
+
+
+def content_etag(body):
+    """ETag derived from the image bytes, so it stays valid across restarts."""
+    return hashlib.sha1(body).hexdigest()[:16]
+
+
+def quantize_png(png):
+    """Re-encode a PNG as an optimized palette PNG."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(png)) as image:
+        paletted = image.convert('RGB').quantize(colors=PALETTE_COLORS)
+        out = io.BytesIO()
+        paletted.save(out, format='PNG', optimize=True)
+        return out.getvalue()
+
+
+def encode_webp(png):
+    """Re-encode a PNG as lossless WebP of its palette-reduced colours.
+
+    Lossless WebP of the full-colour render comes out larger than the palette
+    PNG; with the same PALETTE_COLORS it is the smallest of the three.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(png)) as image:
+        paletted = image.convert('RGB').quantize(colors=PALETTE_COLORS)
+        out = io.BytesIO()
+        paletted.convert('RGB').save(out, format='WEBP', lossless=True, method=4)
+        return out.getvalue()
+
+
+def make_chart_renderer(figsize, dpi):
+    # Imported here to keep matplotlib off the startup path
+    from chart_renderer import ChartRenderer
+
+    return ChartRenderer(figsize=figsize, dpi=dpi)
+
+
+def make_stack_chart_renderer(figsize, dpi):
+    from chart_renderer import StackChartRenderer
+
+    return StackChartRenderer(figsize=figsize, dpi=dpi)
+
+
+class ChartVariants:
+    """Renders /chart at different sizes and formats, caching the encoded results.
+
+    Encoded images live in an LRU keyed by (width, height, format, data key)
+    and capped by total bytes. The data key changes whenever the cached data
+    or the day changes, so stale variants simply age out.
+    """
+
+    def __init__(self, max_bytes=VARIANT_CACHE_BYTES, max_pixels=RENDERER_PIXELS,
+                 renderer_factory=None):
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        # Called as renderer_factory(figsize=..., dpi=...); defaults to a ChartRenderer
+        self.renderer_factory = renderer_factory or make_chart_renderer
+        self.variants = OrderedDict()
+        self.total_bytes = 0
+        self.renderers = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, width, height, fmt, data_key, render):
+        """Return cached bytes for a variant, or build them with render(renderer, fmt)."""
+        key = (width, height, fmt, data_key)
+        with self.lock:
+            body = self.variants.get(key)
+            if body is not None:
+                self.variants.move_to_end(key)
+                return body
+
+        # Build and render outside the cache lock, so hits aren't held up by a
+        # new figure (or the first matplotlib import); the renderer has its own lock
+        renderer = self._renderer(width, height)
+        if fmt == 'svg':
+            body = render(renderer, 'svg')
+        elif fmt == 'webp':
+            body = encode_webp(render(renderer, 'png'))
+        else:
+            body = quantize_png(render(renderer, 'png'))
+
+        with self.lock:
+            if key not in self.variants and len(body) <= self.max_bytes:
+                self.variants[key] = body
+                self.total_bytes += len(body)
+                while self.total_bytes > self.max_bytes:
+                    _, evicted = self.variants.popitem(last=False)
+                    self.total_bytes -= len(evicted)
+        return body
+
+    def recent_sizes(self):
+        """(width, height) of the sizes rendered recently, oldest first."""
+        with self.lock:
+            return list(self.renderers)
+
+    def _renderer(self, width, height):
+        size = (width, height)
+        with self.lock:
+            renderer = self.renderers.get(size)
+            if renderer is not None:
+                self.renderers.move_to_end(size)
+                return renderer
+
+        dpi = width / FIGURE_WIDTH_INCHES
+        built = self.renderer_factory(figsize=(FIGURE_WIDTH_INCHES, height / dpi), dpi=dpi)
+
+        with self.lock:
+            # Another request may have built this size meanwhile; keep the first
+            renderer = self.renderers.setdefault(size, built)
+            self.renderers.move_to_end(size)
+
+            # Drop the least recently used sizes over the pixel budget, always keeping this one
+            pixels = sum(w * h for w, h in self.renderers)
+            while pixels > self.max_pixels and len(self.renderers) > 1:
+                (w, h), _ = self.renderers.popitem(last=False)
+                pixels -= w * h
+        return renderer
@@ -0,0 +1,254 @@
+import datetime
+import json
+from collections import OrderedDict
+
+import numpy as np
+
+from sessions import day_key
+
+MINUTES_PER_DAY = 24 * 60
+
+# Number of peaks tracked per day
+PEAK_COUNT = 5
+
+# Peaks closer than this are treated as the same busy spell
+PEAK_SEPARATION_MINUTES = 60
+
+# Hours of the day (UTC, end exclusive) the space counts as open
+OPEN_HOURS = (8, 22)
+
+# Number of quietest open hours reported per day
+QUIET_HOURS = 3
+
+# An hour needs at least this many elapsed, tracked minutes to be ranked busiest or quietest
+MIN_HOUR_MINUTES = 30
+
+# The series only has minutes with detections. Gaps up to this long are
+# between scans (the adaptive interval tops out at 8 minutes) and are
+# interpolated; longer ones mean nothing was detected and count as zero.
+MAX_GAP_MINUTES = 15
+
+# The most recent minutes of the smoothed series are still revised by the
+# centered rolling window and the EWM, so they are rewritten on every update
+REVISION_MINUTES = 30
+
+# Number of days of statistics to keep
+DAYS_TO_KEEP = 7
+
+
+def top_peaks(values, count=PEAK_COUNT, separation=PEAK_SEPARATION_MINUTES):
+    """Return [(minute, value)] for the highest local maxima at least `separation` points apart.
+
+    `values` is one value per minute, NaN where there is no data. Missing minutes
+    are skipped over and don't count towards the separation, as with scipy's
+    find_peaks on the sparse series. A flat top counts as a single peak at its
+    middle, and the series' ends are never peaks.
+    """
+    minutes = np.flatnonzero(~np.isnan(values))
+    y = values[minutes]
+    if len(y) < 3:
+        return []
+
+    # Collapse runs of equal values, so plateaus become single points
+    run_starts = np.flatnonzero(np.r_[True, y[1:] != y[:-1]])
+    run_ends = np.r_[run_starts[1:], len(y)] - 1
+    run_values = y[run_starts]
+
+    # A run higher than both neighbouring runs is a peak
+    is_peak = np.zeros(len(run_values), dtype=bool)
+    is_peak[1:-1] = (run_values[1:-1] > run_values[:-2]) & (run_values[1:-1] > run_values[2:])
+    candidates = (run_starts[is_peak] + run_ends[is_peak]) // 2
+    heights = run_values[is_peak]
+
+    # Keep the highest first, dropping any too close to one already kept. The
+    # same unstable argsort as find_peaks(distance=...) settles ties the same way
+    keep = np.ones(len(candidates), dtype=bool)
+    for i in np.argsort(heights)[::-1]:
+        if keep[i]:
+            too_close = np.abs(candidates - candidates[i]) < separation
+            too_close[i] = False
+            keep &= ~too_close
+
+    # Highest first, and earliest first among equals, as the old sorted() of find_peaks gave
+    kept = np.flatnonzero(keep)
+    kept = kept[np.argsort(-heights[kept], kind='stable')][:count]
+    return [(int(minutes[candidates[i]]), float(heights[i])) for i in kept]
+
+
+class DailyStats:
+    """One UTC day of the smoothed occupancy series, with statistics derived from it."""
+
+    __slots__ = ('values', 'peaks', 'stats', 'dirty')
+
+    def __init__(self):
+        self.values = np.full(MINUTES_PER_DAY, np.nan)
+        self.peaks = []
+        self.stats = None
+        self.dirty = True
+
+
+class DailyStatsIndex:
+    """Per-day peaks, busiest and quietest hours and totals, maintained as minutes arrive.
+
+    Each update only writes the minutes at or after the previous watermark
+    (less REVISION_MINUTES), and only the days those minutes fall on are
+    recomputed. Readers get precomputed results, so nothing is scanned at
+    render time.
+    """
+
+    def __init__(self, days_to_keep=DAYS_TO_KEEP, peak_count=PEAK_COUNT,
+                 separation=PEAK_SEPARATION_MINUTES):
+        self.days_to_keep = days_to_keep
+        self.peak_count = peak_count
+        self.separation = separation
+        self.days = OrderedDict()
+        self.first_minute = None
+        self.watermark = None
+
+    def update(self, epoch_minutes, values):
+        """Feed a smoothed per-minute series; epoch_minutes must be sorted."""
+        epoch_minutes = np.asarray(epoch_minutes, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if len(epoch_minutes) == 0:
+            return
+
+        if self.watermark is not None:
+            fresh = epoch_minutes >= self.watermark - REVISION_MINUTES
+            epoch_minutes = epoch_minutes[fresh]
+            values = values[fresh]
+            if len(epoch_minutes) == 0:
+                return
+
+        if self.first_minute is None:
+            self.first_minute = int(epoch_minutes[0])
+
+        days = epoch_minutes // MINUTES_PER_DAY
+        # The previous day's last minutes are interpolated towards this update's first points
+        previous = self.days.get(int(days[0]) - 1)
+        if previous is not None:
+            previous.dirty = True
+        day_starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        day_ends = np.r_[day_starts[1:], len(days)]
+        for start, end in zip(day_starts, day_ends):
+            day = int(days[start])
+            stats = self.days.get(day)
+            if stats is None:
+                stats = self.days[day] = DailyStats()
+            stats.values[epoch_minutes[start:end] % MINUTES_PER_DAY] = values[start:end]
+            stats.dirty = True
+
+        self.watermark = int(epoch_minutes[-1])
+
+        # Minutes arrive in order, so the oldest days are at the front
+        while len(self.days) > self.days_to_keep:
+            self.days.popitem(last=False)
+
+        for day, stats in self.days.items():
+            if stats.dirty:
+                self._recompute(day, stats)
+
+    def peaks(self, day):
+        """[(epoch minute, value)] of the day's peaks, highest first."""
+        stats = self.days.get(day)
+        return stats.peaks if stats is not None else []
+
+    def all_peaks(self):
+        """Peaks for every tracked day, keyed by day number (days since the epoch)."""
+        return {day: stats.peaks for day, stats in self.days.items()}
+
+    def _filled(self, day, stats):
+        """The day on a full minute grid, NaN outside the tracked, elapsed minutes.
+
+        Minutes between two data points up to MAX_GAP_MINUTES apart are
+        interpolated (using the neighbouring days' nearest points across
+        midnight); the rest of the elapsed time counts as zero.
+        """
+        day_start = day * MINUTES_PER_DAY
+        filled = np.full(MINUTES_PER_DAY, np.nan)
+        start = max(day_start, self.first_minute) - day_start
+        end = min(day_start + MINUTES_PER_DAY, self.watermark + 1) - day_start
+        if end <= start:
+            return filled
+
+        present = np.flatnonzero(~np.isnan(stats.values))
+        xp, fp = [present], [stats.values[present]]
+        previous, following = self.days.get(day - 1), self.days.get(day + 1)
+        if previous is not None and not np.isnan(previous.values).all():
+            last = np.flatnonzero(~np.isnan(previous.values))[-1]
+            xp.insert(0, [last - MINUTES_PER_DAY])
+            fp.insert(0, [previous.values[last]])
+        if following is not None and not np.isnan(following.values).all():
+            first = np.flatnonzero(~np.isnan(following.values))[0]
+            xp.append([first + MINUTES_PER_DAY])
+            fp.append([following.values[first]])
+        xp, fp = np.concatenate(xp), np.concatenate(fp)
+
+        minutes = np.arange(start, end)
+        if len(xp) == 0:
+            filled[start:end] = 0
+            return filled
+
+        # Distance between the data points either side of each minute
+        after = np.searchsorted(xp, minutes)
+        before = np.where(after > 0, xp[np.maximum(after - 1, 0)], -np.inf)
+        is_point = (after < len(xp)) & (xp[np.minimum(after, len(xp) - 1)] == minutes)
+        after = np.where(after < len(xp), xp[np.minimum(after, len(xp) - 1)], np.inf)
+        quiet = (after - before > MAX_GAP_MINUTES) & ~is_point
+
+        filled[start:end] = np.where(quiet, 0.0, np.interp(minutes, xp, fp))
+        return filled
+
+    def _recompute(self, day, stats):
+        values = stats.values
+        day_start = day * MINUTES_PER_DAY
+        stats.peaks = [(day_start + minute, value) for minute, value in
+                       top_peaks(values, self.peak_count, self.separation)]
+
+        # Hourly means over the elapsed minutes, with the gaps between scans filled in
+        hourly = self._filled(day, stats).reshape(24, 60)
+        elapsed = (~np.isnan(hourly)).sum(axis=1)
+        sums = np.nansum(hourly, axis=1)
+        means = np.divide(sums, elapsed, out=np.full(24, np.nan), where=elapsed > 0)
+        rankable = elapsed >= MIN_HOUR_MINUTES
+
+        busiest = None
+        if rankable.any():
+            hour = int(np.nanargmax(np.where(rankable, means, np.nan)))
+            busiest = {'hour': hour, 'mean': round(float(means[hour]), 1)}
+
+        open_hours = np.arange(*OPEN_HOURS)
+        open_hours = open_hours[rankable[open_hours]]
+        quietest = open_hours[np.argsort(means[open_hours], kind='stable')][:QUIET_HOURS]
+
+        minutes = int((~np.isnan(values)).sum())
+        elapsed_minutes = int(elapsed.sum())
+        stats.stats = {
+            'minutes': minutes,
+            'elapsed_minutes': elapsed_minutes,
+            'peaks': [{'time': _minute_iso(minute), 'value': round(value, 1)}
+                      for minute, value in stats.peaks],
+            'busiest_hour': busiest,
+            'quietest_open_hours': [{'hour': int(hour), 'mean': round(float(means[hour]), 1)}
+                                    for hour in quietest],
+            'totals': {
+                'person_hours': round(float(sums.sum()) / 60, 1),
+                'mean': round(float(sums.sum()) / elapsed_minutes, 1) if elapsed_minutes else None,
+                'max': round(float(np.nanmax(values)), 1) if minutes else None,
+            },
+        }
+        stats.dirty = False
+
+    def summary(self):
+        """Daily statistics as a JSON-serializable dict, oldest day first."""
+        return {
+            'open_hours': list(OPEN_HOURS),
+            'peak_separation_minutes': self.separation,
+            'days': {day_key(day): stats.stats for day, stats in self.days.items()},
+        }
+
+    def summary_json(self):
+        return json.dumps(self.summary())
+
+
+def _minute_iso(epoch_minute):
+    return datetime.datetime.fromtimestamp(epoch_minute * 60, datetime.timezone.utc).isoformat()
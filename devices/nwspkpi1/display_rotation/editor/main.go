@@ -18,8 +18,19 @@ type PageConfig struct {
 }
 
 type PageStatus struct {
-	Active bool `json:"active"`
-	Order  int  `json:"order"`
+	Active   bool             `json:"active"`
+	Order    int              `json:"order"`
+	Duration int              `json:"duration,omitempty"`
+	Schedule []ScheduleWindow `json:"schedule,omitempty"`
+}
+
+// ScheduleWindow limits a page to a time of day, and optionally to some weekdays.
+// Duration and Schedule are read by the Flask app's /rotation manifest; they're
+// declared here so saving the config from the editor keeps them.
+type ScheduleWindow struct {
+	Start string   `json:"start"`
+	End   string   `json:"end"`
+	Days  []string `json:"days,omitempty"`
 }
 
 func main() {
@@ -0,0 +1,364 @@
+import csv
+import datetime
+import io
+import json
+import zlib
+from pathlib import Path
+
+# Kept to the standard library and line-at-a-time reads, so an export of any
+# length streams from the daily logs without pandas or loading whole files
+
+EXPORT_KINDS = ('counts', 'rollups', 'raw')
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+ROLLUP_PERIODS = {
+    # Length of the timestamp prefix shared by every row in a period
+    'hour': len('YYYY-MM-DD HH'),
+    'day': len('YYYY-MM-DD'),
+}
+
+# Records per response before a cursor is emitted to fetch the rest
+DEFAULT_PAGE_ROWS = 100000
+MAX_PAGE_ROWS = 1000000
+
+# Bytes of output gathered before each chunk is sent
+CHUNK_BYTES = 64 * 1024
+
+RAW_COLUMNS = ['Timestamp', 'MAC Address', 'RSSI', 'Manufacturer']
+COUNT_COLUMNS = ['Timestamp', 'Detections', 'Scans', 'Count']
+ROLLUP_COLUMNS = ['Period', 'Minutes', 'Detections', 'Scans', 'Distinct Devices',
+                  'Mean Count', 'Peak Count']
+
+# ble_scanner writes timestamps in this format, so ranges compare as plain strings
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _parse_time(value, name):
+    """ISO date or datetime to the log timestamp format; aware times are converted to UTC."""
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date or datetime")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed.strftime(TIMESTAMP_FORMAT)
+
+
+def encode_cursor(day, offset):
+    return f'{day}:{offset}'
+
+
+def decode_cursor(cursor):
+    """Cursor to (day, byte offset into that day's log), raising ValueError if malformed."""
+    day, _, offset = cursor.partition(':')
+    datetime.date.fromisoformat(day)
+    offset = int(offset)
+    if offset < 0:
+        raise ValueError("negative offset")
+    return day, offset
+
+
+def parse_export_args(kind, args):
+    """Resolve an export request to its options, raising ValueError if invalid."""
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"Unknown export '{kind}'")
+
+    fmt = args.get('format', 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}'")
+
+    start = args.get('start')
+    end = args.get('end')
+    start = _parse_time(start, 'start') if start else None
+    end = _parse_time(end, 'end') if end else None
+    if start and end and start >= end:
+        raise ValueError("start must be before end")
+
+    limit = args.get('limit', default=DEFAULT_PAGE_ROWS, type=int)
+    if limit is None or not 0 < limit <= MAX_PAGE_ROWS:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_ROWS}")
+
+    cursor = args.get('cursor')
+    if cursor:
+        try:
+            cursor = decode_cursor(cursor)
+        except ValueError:
+            raise ValueError("Invalid cursor")
+
+    period = args.get('period', 'hour')
+    if kind == 'rollups' and period not in ROLLUP_PERIODS:
+        raise ValueError(f"Unknown rollup period '{period}'")
+
+    min_rssi = args.get('min_rssi', type=int)
+    if 'min_rssi' in args and min_rssi is None:
+        raise ValueError("min_rssi must be an integer")
+
+    return {
+        'kind': kind,
+        'format': fmt,
+        'gzip': args.get('gzip', '0').lower() in ('1', 'true', 'yes'),
+        'start': start,
+        'end': end,
+        'limit': limit,
+        'cursor': cursor,
+        'period': period,
+        'mac': args.get('mac', '').lower() or None,
+        'manufacturer': args.get('manufacturer') or None,
+        'min_rssi': min_rssi,
+    }
+
+
+def export_filename(options):
+    start = (options['start'] or 'start')[:10]
+    end = (options['end'] or 'now')[:10]
+    name = options['kind'] if options['kind'] != 'rollups' else f"rollups_{options['period']}"
+    extension = options['format'] + ('.gz' if options['gzip'] else '')
+    return f'{name}_{start}_{end}.{extension}'
+
+
+def _day_files(logs_dir, prefix, start, end, cursor):
+    """(day, path) of the daily files overlapping the range, from the cursor's day on."""
+    first_day = start[:10] if start else None
+    if cursor and (first_day is None or cursor[0] > first_day):
+        first_day = cursor[0]
+    last_day = end[:10] if end else None
+
+    for path in sorted(Path(logs_dir).glob(f'{prefix}*.csv')):
+        day = path.stem[len(prefix):]
+        if first_day and day < first_day:
+            continue
+        if last_day and day > last_day:
+            break
+        yield day, path
+
+
+def iter_log_rows(logs_dir, start=None, end=None, cursor=None):
+    """Yield (day, offset, row dict) for log rows in [start, end), oldest first.
+
+    Files are read a line at a time in binary so each row's byte offset is
+    known, which is what cursors point at. A last line without its newline
+    is still being written by ble_scanner and is left for the next export.
+    """
+    for day, path in _day_files(logs_dir, 'ble_log_', start, end, cursor):
+        try:
+            with open(path, 'rb') as f:
+                header = next(csv.reader([f.readline().decode('utf-8')]), None)
+                if not header:
+                    continue
+                offset = f.tell()
+                if cursor and cursor[0] == day and cursor[1] > offset:
+                    f.seek(cursor[1])
+                    offset = cursor[1]
+
+                for line in f:
+                    row_offset = offset
+                    offset += len(line)
+                    if not line.endswith(b'\n'):
+                        break
+                    values = next(csv.reader([line.decode('utf-8', errors='replace')]), None)
+                    if not values or len(values) < len(header):
+                        continue
+                    row = dict(zip(header, values))
+                    timestamp = row['Timestamp']
+                    if start and timestamp < start:
+                        continue
+                    if end and timestamp >= end:
+                        return
+                    yield day, row_offset, row
+        except OSError as e:
+            print(f"Error reading {path} for export: {e}")
+
+
+def load_scans_per_minute(logs_dir, day):
+    """{'YYYY-MM-DD HH:MM': scans} from a day's scan sidecar; empty if it doesn't exist."""
+    path = Path(logs_dir) / f'scans_{day}.csv'
+    scans = {}
+    try:
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                minute = row['Timestamp'][:16]
+                scans[minute] = scans.get(minute, 0) + 1
+    except FileNotFoundError:
+        pass
+    except (OSError, KeyError) as e:
+        print(f"Error reading {path} for export: {e}")
+    return scans
+
+
+def raw_records(logs_dir, options):
+    """Yield ((day, offset), record) for filtered raw scan rows."""
+    mac = options['mac']
+    manufacturer = options['manufacturer']
+    min_rssi = options['min_rssi']
+    for day, offset, row in iter_log_rows(logs_dir, options['start'], options['end'],
+                                          options['cursor']):
+        if mac and row['MAC Address'].lower() != mac:
+            continue
+        if manufacturer and row['Manufacturer'] != manufacturer:
+            continue
+        if min_rssi is not None:
+            try:
+                if int(row['RSSI']) < min_rssi:
+                    continue
+            except ValueError:
+                continue
+        yield (day, offset), {column: row.get(column, '') for column in RAW_COLUMNS}
+
+
+def _minute_groups(logs_dir, options):
+    """Yield ((day, offset), minute, detections, scans, MACs) per minute with detections."""
+    scans_day = None
+    scans = {}
+    minute = position = None
+    detections = 0
+    macs = set()
+    for day, offset, row in iter_log_rows(logs_dir, options['start'], options['end'],
+                                          options['cursor']):
+        row_minute = row['Timestamp'][:16]
+        if row_minute != minute:
+            if minute is not None:
+                yield position, minute, detections, scans.get(minute), macs
+            if day != scans_day:
+                scans = load_scans_per_minute(logs_dir, day)
+                scans_day = day
+            position = (day, offset)
+            minute = row_minute
+            detections = 0
+            macs = set()
+        detections += 1
+        macs.add(row['MAC Address'])
+    if minute is not None:
+        yield position, minute, detections, scans.get(minute), macs
+
+
+def count_records(logs_dir, options):
+    """Yield ((day, offset), record) of detections per scan for each minute.
+
+    Like counts.csv, a minute without a scan sidecar row counts as one scan.
+    """
+    for position, minute, detections, scans, _ in _minute_groups(logs_dir, options):
+        yield position, {
+            'Timestamp': f'{minute}:00',
+            'Detections': detections,
+            'Scans': scans,
+            'Count': round(detections / (scans or 1), 3),
+        }
+
+
+def rollup_records(logs_dir, options):
+    """Yield ((day, offset), record) of per-minute counts rolled up by hour or day."""
+    prefix = ROLLUP_PERIODS[options['period']]
+    period = period_position = None
+    totals = {}
+    devices = set()
+    for position, minute, detections, scans, macs in _minute_groups(logs_dir, options):
+        minute_period = minute[:prefix]
+        if minute_period != period:
+            if period is not None:
+                yield period_position, _rollup_record(period, totals, devices)
+            period = minute_period
+            period_position = position
+            totals = {'minutes': 0, 'detections': 0, 'scans': 0, 'count_sum': 0.0,
+                      'peak': 0.0}
+            devices = set()
+        count = detections / (scans or 1)
+        totals['minutes'] += 1
+        totals['detections'] += detections
+        totals['scans'] += scans or 1
+        totals['count_sum'] += count
+        totals['peak'] = max(totals['peak'], count)
+        devices |= macs
+    if period is not None:
+        yield period_position, _rollup_record(period, totals, devices)
+
+
+def _rollup_record(period, totals, devices):
+    if len(period) == ROLLUP_PERIODS['hour']:
+        period = f'{period}:00:00'
+    return {
+        'Period': period,
+        'Minutes': totals['minutes'],
+        'Detections': totals['detections'],
+        'Scans': totals['scans'],
+        'Distinct Devices': len(devices),
+        'Mean Count': round(totals['count_sum'] / totals['minutes'], 3),
+        'Peak Count': round(totals['peak'], 3),
+    }
+
+
+EXPORT_RECORDS = {
+    'counts': (count_records, COUNT_COLUMNS),
+    'rollups': (rollup_records, ROLLUP_COLUMNS),
+    'raw': (raw_records, RAW_COLUMNS),
+}
+
+
+def _lines(options, records, columns):
+    """Encoded output lines: header, records up to the limit, then a cursor if there's more."""
+    fmt = options['format']
+
+    # One reusable buffer turns each record into a properly quoted CSV line
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+
+    def csv_line(values):
+        out.seek(0)
+        out.truncate()
+        writer.writerow(['' if value is None else value for value in values])
+        return out.getvalue().encode('utf-8')
+
+    if fmt == 'csv':
+        yield csv_line(columns)
+
+    emitted = 0
+    for position, record in records:
+        if emitted == options['limit']:
+            # This record starts the next page
+            cursor = encode_cursor(*position)
+            if fmt == 'csv':
+                yield f'# next_cursor={cursor}\n'.encode('utf-8')
+            else:
+                yield (json.dumps({'next_cursor': cursor}) + '\n').encode('utf-8')
+            return
+
+        if fmt == 'csv':
+            yield csv_line([record[column] for column in columns])
+        else:
+            yield (json.dumps(record) + '\n').encode('utf-8')
+        emitted += 1
+
+
+def stream_export(logs_dir, options):
+    """Generate the export body in chunks, gzip-compressed if requested.
+
+    A page that stops at the row limit ends with a trailer holding the cursor
+    for the next page: a '# next_cursor=...' comment line in CSV, or a
+    {"next_cursor": ...} object in NDJSON. A complete export has no trailer.
+    """
+    make_records, columns = EXPORT_RECORDS[options['kind']]
+    records = make_records(logs_dir, options)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if options['gzip'] else None
+
+    buffer = []
+    buffered = 0
+    for line in _lines(options, records, columns):
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= CHUNK_BYTES:
+            chunk = b''.join(buffer)
+            buffer = []
+            buffered = 0
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    chunk = b''.join(buffer)
+    if compressor is not None:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
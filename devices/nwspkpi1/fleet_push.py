@@ -0,0 +1,158 @@
+import gzip
+import json
+import os
+import socket
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+# Minutes re-sent from before the last queued minute, since the newest
+# minutes can still gain rows on the next update pass
+OVERLAP_MINUTES = 15
+
+# Oldest batches are dropped beyond this, about a week of 10-minute passes
+MAX_SPOOL_FILES = 1000
+
+# Attempts per batch before giving up until the next pass
+MAX_ATTEMPTS = 3
+
+
+def http_post(url, body, headers, timeout=10):
+    """POST a body and return the HTTP status code."""
+    request = urllib.request.Request(url, data=body, headers=headers, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+class FleetPusher:
+    """Push this device's minute counts to the fleet aggregator.
+
+    Every pass writes the new minutes to a gzipped batch file in the spool
+    directory, then sends the spool oldest first. Batches are only deleted once
+    the aggregator accepts them, so an outage just leaves files behind to be
+    backfilled on a later pass. The aggregator upserts by (device, minute), so
+    re-sending a batch or an overlapping minute is harmless.
+    """
+
+    def __init__(self, url, device_id, room, spool_dir='fleet_spool',
+                 state_path='fleet_state.json', post=http_post, sleep=time.sleep):
+        self.url = url.rstrip('/') + '/ingest'
+        self.device_id = device_id
+        self.room = room
+        self.spool_dir = Path(spool_dir)
+        self.state_path = state_path
+        self.post = post
+        self.sleep = sleep
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """Build a pusher from FLEET_* environment variables, or None if not configured."""
+        url = os.getenv('FLEET_AGGREGATOR_URL')
+        if not url:
+            return None
+        return cls(url,
+                   device_id=os.getenv('FLEET_DEVICE_ID', socket.gethostname()),
+                   room=os.getenv('FLEET_ROOM', 'living-room'),
+                   spool_dir=os.getenv('FLEET_SPOOL_DIR', 'fleet_spool'))
+
+    def push(self, counts_df):
+        """Queue minutes from a Timestamp/Count frame and try to send the spool."""
+        self.queue(counts_df)
+        return self.flush()
+
+    def queue(self, counts_df):
+        """Write minutes not yet queued (plus a short overlap) to a new batch file."""
+        if counts_df is None or counts_df.empty:
+            return None
+
+        state = self._load_state()
+        queued_until = state.get('queued_until')
+
+        epoch_minutes = counts_df['Timestamp'].values.astype('datetime64[m]').astype('int64')
+        counts = counts_df['Count'].values
+        if queued_until is not None:
+            is_new = epoch_minutes >= queued_until - OVERLAP_MINUTES
+            epoch_minutes = epoch_minutes[is_new]
+            counts = counts[is_new]
+        if len(epoch_minutes) == 0:
+            return None
+
+        batch = {
+            'device': self.device_id,
+            'room': self.room,
+            'minutes': [[int(minute), float(count)]
+                        for minute, count in zip(epoch_minutes, counts)],
+        }
+        first, last = int(epoch_minutes.min()), int(epoch_minutes.max())
+        batch_path = self.spool_dir / f"{first:010d}_{last:010d}.json.gz"
+        tmp_path = batch_path.with_suffix('.tmp')
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(batch, f)
+        os.replace(tmp_path, batch_path)
+
+        state['queued_until'] = max(last, queued_until or last)
+        self._save_state(state)
+        self._trim_spool()
+        return batch_path
+
+    def flush(self):
+        """Send spooled batches oldest first; stop at the first one that keeps failing."""
+        sent = 0
+        for batch_path in sorted(self.spool_dir.glob('*.json.gz')):
+            if not self._send(batch_path):
+                print(f"Fleet aggregator unreachable, {self.pending()} batches left in spool")
+                break
+            batch_path.unlink()
+            sent += 1
+        return sent
+
+    def pending(self):
+        return len(list(self.spool_dir.glob('*.json.gz')))
+
+    def _send(self, batch_path):
+        # The file is already gzipped JSON, so it is posted as-is
+        body = batch_path.read_bytes()
+        headers = {
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+        }
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                status = self.post(self.url, body, headers)
+                if 200 <= status < 300:
+                    return True
+                if 400 <= status < 500:
+                    # The aggregator will never accept this batch; don't block the spool on it
+                    print(f"Fleet aggregator rejected {batch_path.name} with {status}, dropping it")
+                    return True
+            except OSError as e:
+                print(f"Error pushing {batch_path.name} (attempt {attempt + 1}): {e}")
+            if attempt < MAX_ATTEMPTS - 1:
+                self.sleep(2 ** attempt)
+        return False
+
+    def _trim_spool(self):
+        batches = sorted(self.spool_dir.glob('*.json.gz'))
+        for batch_path in batches[:-MAX_SPOOL_FILES]:
+            print(f"Fleet spool full, dropping {batch_path.name}")
+            batch_path.unlink()
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path) as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error reading {self.state_path}: {e}")
+        return {}
+
+    def _save_state(self, state):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
@@ -0,0 +1,177 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+
+# display_rotation/ holds the kiosk pages and pages-config.json maintained by the editor
+ROTATION_DIR = os.getenv('ROTATION_DIR',
+                         os.path.join(os.path.dirname(os.path.abspath(__file__)), 'display_rotation'))
+
+# Seconds a page stays up when its config doesn't set a duration
+DEFAULT_DURATION_SECONDS = 5 * 60
+
+# Pages that are part of the kiosk itself rather than the rotation
+EXCLUDED_PAGES = ('rotator.html', 'index.html')
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+WEEKDAY_NAMES = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+
+def _parse_clock(value):
+    """'HH:MM' to minutes since midnight."""
+    hours, minutes = value.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def _parse_days(days):
+    """A window's days as WEEKDAYS names; any case, abbreviated or spelled out ("Mon", "monday")."""
+    if isinstance(days, str):
+        raise ValueError(f"days must be a list, not {days!r}")
+    parsed = []
+    for day in days:
+        name = str(day).strip().lower()
+        if len(name) < 3 or not any(full.startswith(name) for full in WEEKDAY_NAMES):
+            raise ValueError(f"unknown day {day!r}")
+        parsed.append(name[:3])
+    return parsed
+
+
+def in_schedule(schedule, now):
+    """Whether `now` (local time) falls in any of a page's schedule windows.
+
+    Each window is {"start": "HH:MM", "end": "HH:MM"} with an optional "days"
+    list ("mon".."sun", as normalized by RotationManifest); a window whose end
+    is before its start runs past midnight. A page without a schedule is always
+    shown.
+    """
+    if not schedule:
+        return True
+
+    minute = now.hour * 60 + now.minute
+    today = WEEKDAYS[now.weekday()]
+    yesterday = WEEKDAYS[(now.weekday() - 1) % 7]
+    for window in schedule:
+        start = _parse_clock(window.get('start', '00:00'))
+        end = _parse_clock(window.get('end', '24:00'))
+        days = window.get('days')
+        if start <= end:
+            if start <= minute < end and (not days or today in days):
+                return True
+        else:
+            # Overnight windows belong to the day they start on
+            if minute >= start and (not days or today in days):
+                return True
+            if minute < end and (not days or yesterday in days):
+                return True
+    return False
+
+
+class RotationManifest:
+    """The kiosk's active page list, rebuilt only when the config or pages change.
+
+    Parsed entries are cached against the mtimes of pages-config.json and the
+    pages directory, so a poll is two stat() calls plus a schedule check. The
+    served body and its ETag are cached per active set, which only changes
+    when an edit lands or a schedule window opens or closes.
+    """
+
+    def __init__(self, rotation_dir=ROTATION_DIR):
+        self.pages_dir = os.path.join(rotation_dir, 'pages')
+        self.config_path = os.path.join(rotation_dir, 'config', 'pages-config.json')
+        self.key = None
+        self.entries = []
+        self.body = None
+        self.etag = None
+        self.active = None
+        self.lock = threading.Lock()
+
+    def get(self, now=None):
+        """Return (JSON body, ETag) for the pages to show at `now` (local time)."""
+        if now is None:
+            now = datetime.datetime.now()
+
+        with self.lock:
+            key = (self._mtime(self.config_path), self._mtime(self.pages_dir))
+            if key != self.key:
+                entries = self._load()
+                # On a failed read (e.g. the editor is mid-write) keep the
+                # previous entries and leave the key stale so the next poll retries
+                if entries is not None:
+                    self.entries = entries
+                    self.key = key
+                    self.active = None
+
+            active = [entry for entry in self.entries if in_schedule(entry['schedule'], now)]
+            if active != self.active:
+                payload = {
+                    'default_duration': DEFAULT_DURATION_SECONDS,
+                    'pages': [{'page': entry['page'], 'duration': entry['duration']}
+                              for entry in active],
+                }
+                self.body = json.dumps(payload)
+                self.etag = hashlib.sha1(self.body.encode('utf-8')).hexdigest()[:16]
+                self.active = active
+            return self.body, self.etag
+
+    def _mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self):
+        """Active pages in rotation order, with their durations and schedules.
+
+        Returns None when the pages or the config can't be read.
+        """
+        try:
+            pages = sorted(name for name in os.listdir(self.pages_dir)
+                           if name.endswith('.html') and name not in EXCLUDED_PAGES)
+        except OSError as e:
+            print(f"Error listing rotation pages: {e}")
+            return None
+
+        try:
+            with open(self.config_path) as f:
+                config = json.load(f).get('pages', {})
+        except FileNotFoundError:
+            # Like list-pages.php, with no config every page is active
+            return [{'page': page, 'duration': DEFAULT_DURATION_SECONDS, 'schedule': None}
+                    for page in pages]
+        except (OSError, ValueError) as e:
+            print(f"Error reading rotation config: {e}")
+            return None
+
+        entries = []
+        for page in pages:
+            settings = config.get(page)
+            if not settings or not settings.get('active'):
+                continue
+            try:
+                duration = int(settings.get('duration') or DEFAULT_DURATION_SECONDS)
+            except (TypeError, ValueError):
+                print(f"Ignoring invalid duration for {page}: {settings.get('duration')!r}")
+                duration = DEFAULT_DURATION_SECONDS
+            try:
+                schedule = settings.get('schedule') or None
+                if schedule:
+                    # Validate now rather than on every poll
+                    schedule = [dict(window) for window in schedule]
+                    for window in schedule:
+                        _parse_clock(window.get('start', '00:00'))
+                        _parse_clock(window.get('end', '24:00'))
+                        if window.get('days'):
+                            window['days'] = _parse_days(window['days'])
+            except (AttributeError, TypeError, ValueError) as e:
+                print(f"Ignoring invalid schedule for {page}: {e}")
+                schedule = None
+            entries.append({
+                'page': page,
+                'order': settings.get('order', 0),
+                'duration': duration,
+                'schedule': schedule,
+            })
+
+        entries.sort(key=lambda entry: entry['order'])
+        return entries
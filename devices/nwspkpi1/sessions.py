@@ -0,0 +1,173 @@
+import datetime
+import json
+from collections import OrderedDict
+
+# A device unseen for this long is treated as having left
+SESSION_GAP_SECONDS = 10 * 60
+
+# Devices that never leave (TVs, fridges) are split into sessions of at most this length
+MAX_SESSION_SECONDS = 12 * 60 * 60
+
+# Upper edges of the dwell-time histogram bins, in minutes
+DWELL_BINS_MINUTES = [5, 15, 30, 60, 120, 240, 480]
+
+# Number of days of daily aggregates to keep
+DAYS_TO_KEEP = 7
+
+
+class DailyVisitStats:
+    """Aggregates for a single day: distinct visitors, visit count and dwell histograms."""
+
+    __slots__ = ('visitors', 'distinct_visitors', 'visits', 'total_dwell_seconds',
+                 'dwell_histogram', 'arrivals_by_hour')
+
+    def __init__(self):
+        # MACs seen today; replaced by a plain count once the day is over
+        self.visitors = set()
+        self.distinct_visitors = 0
+        self.visits = 0
+        self.total_dwell_seconds = 0
+        self.dwell_histogram = [0] * (len(DWELL_BINS_MINUTES) + 1)
+        self.arrivals_by_hour = [0] * 24
+
+    def close(self):
+        """Drop the per-MAC set once no more rows can arrive for this day."""
+        if self.visitors is not None:
+            self.distinct_visitors = len(self.visitors)
+            self.visitors = None
+
+    def to_dict(self):
+        distinct = self.distinct_visitors if self.visitors is None else len(self.visitors)
+        return {
+            'distinct_visitors': distinct,
+            'visits': self.visits,
+            'mean_dwell_minutes': (round(self.total_dwell_seconds / self.visits / 60, 1)
+                                   if self.visits else None),
+            'dwell_histogram': self.dwell_histogram,
+            'arrivals_by_hour': self.arrivals_by_hour,
+        }
+
+
+class Sessionizer:
+    """Turn time-ordered scan rows into visit sessions.
+
+    Per-device state is an OrderedDict of MAC -> [first_seen, last_seen, scan_count]
+    kept in last-seen order, so expiring idle devices only ever looks at the front
+    and memory is bounded by the number of devices present at once.
+    """
+
+    def __init__(self, gap_seconds=SESSION_GAP_SECONDS,
+                 max_session_seconds=MAX_SESSION_SECONDS, days_to_keep=DAYS_TO_KEEP):
+        self.gap_seconds = gap_seconds
+        self.max_session_seconds = max_session_seconds
+        self.days_to_keep = days_to_keep
+        self.active = OrderedDict()
+        self.days = OrderedDict()
+        self.watermark = None
+        self.current_day = None
+
+    def consume(self, timestamps, macs):
+        """Feed scan rows in timestamp order; timestamps are epoch seconds.
+
+        Rows at or before the watermark have already been consumed and are skipped,
+        so the same log window can be offered repeatedly.
+        """
+        sessions = []
+        last_ts = None
+        for ts, mac in zip(timestamps, macs):
+            ts = int(ts)
+            if self.watermark is not None and ts <= self.watermark:
+                continue
+
+            # Close out devices that have been quiet for longer than the gap
+            sessions.extend(self._expire(ts - self.gap_seconds))
+            self._roll_day(ts // 86400)
+            self.days[self.current_day].visitors.add(mac)
+
+            state = self.active.get(mac)
+            if state is None:
+                self.active[mac] = [ts, ts, 1]
+            else:
+                if ts - state[0] > self.max_session_seconds:
+                    sessions.append(self._emit(mac, state))
+                    state[0] = ts
+                    state[2] = 0
+                state[1] = ts
+                state[2] += 1
+                self.active.move_to_end(mac)
+
+            last_ts = ts
+
+        # A scan's rows are written together, so the last timestamp is complete
+        if last_ts is not None:
+            self.watermark = last_ts
+        return sessions
+
+    def flush(self, now):
+        """Emit sessions for devices not seen since `now - gap`; returns them."""
+        return self._expire(int(now) - self.gap_seconds)
+
+    def _expire(self, cutoff):
+        sessions = []
+        while self.active:
+            mac, state = next(iter(self.active.items()))
+            if state[1] >= cutoff:
+                break
+            self.active.popitem(last=False)
+            sessions.append(self._emit(mac, state))
+        return sessions
+
+    def _emit(self, mac, state):
+        first_seen, last_seen, scan_count = state
+        session = {'mac': mac, 'first_seen': first_seen,
+                   'last_seen': last_seen, 'scan_count': scan_count}
+        self._record(session)
+        return session
+
+    def _record(self, session):
+        """Add a finished session to the aggregates for the day it started."""
+        day = session['first_seen'] // 86400
+        stats = self.days.get(day)
+        if stats is None:
+            # Its day has already been trimmed
+            return
+        dwell = session['last_seen'] - session['first_seen']
+        stats.visits += 1
+        stats.total_dwell_seconds += dwell
+        stats.dwell_histogram[_dwell_bin(dwell)] += 1
+        stats.arrivals_by_hour[(session['first_seen'] // 3600) % 24] += 1
+
+    def _roll_day(self, day):
+        if day == self.current_day:
+            return
+        # Rows arrive in order, so earlier days can no longer gain visitors
+        for stats in self.days.values():
+            stats.close()
+        self.days[day] = DailyVisitStats()
+        self.current_day = day
+        while len(self.days) > self.days_to_keep:
+            self.days.popitem(last=False)
+
+    def summary(self):
+        """Daily aggregates as a JSON-serializable dict, oldest day first."""
+        return {
+            'dwell_bins_minutes': DWELL_BINS_MINUTES,
+            'active_devices': len(self.active),
+            'days': {day_key(day): stats.to_dict() for day, stats in self.days.items()},
+        }
+
+    def summary_json(self):
+        return json.dumps(self.summary())
+
+
+def day_key(day):
+    """Format a day number (days since the epoch) as YYYY-MM-DD."""
+    return (datetime.date(1970, 1, 1) + datetime.timedelta(days=day)).isoformat()
+
+
+def _dwell_bin(dwell_seconds):
+    minutes = dwell_seconds / 60
+    for i, edge in enumerate(DWELL_BINS_MINUTES):
+        if minutes < edge:
+            return i
+    return len(DWELL_BINS_MINUTES)
@@ -0,0 +1,165 @@
+"""Drive ble_scanner's adaptive loop with a simulated room instead of the radio.
+
+The simulated scanner returns device sets for a quiet night, a burst of
+arrivals and a settled event, and a fake clock stands in for sleeping and
+timestamps the logs, so they cover the simulated hours. The run checks that
+the interval stretches while the room is stable, tightens when it churns,
+stays within its bounds, and that app.update_counts_csv and the manufacturer
+breakdown turn every minute's detections back into devices per scan, whether
+the minute had one scan, several, or sits between sparse ones.
+
+    python simulate_scanner.py
+"""
+import csv
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from ble_scanner import MAX_SCAN_INTERVAL, AdaptiveScheduler, run_adaptive
+
+SCAN_DURATION = 10.0
+MIN_INTERVAL = 30.0
+MAX_INTERVAL = MAX_SCAN_INTERVAL
+
+# The simulated run starts this long before the real time, inside the app's 48-hour window
+START_HOURS_AGO = 6
+
+# (phase, scans, function of the scan number within the phase returning MACs)
+PHASES = [
+    ('night', 12, lambda i: {'aa:00:00:00:00:01', 'aa:00:00:00:00:02', 'aa:00:00:00:00:03'}),
+    ('arrivals', 6, lambda i: {f'bb:00:00:00:{i:02x}:{j:02x}' for j in range(8)}),
+    ('event', 12, lambda i: {f'cc:00:00:00:00:{j:02x}' for j in range(20)}),
+]
+
+
+class FakeClock:
+    def __init__(self, start):
+        self.start = start
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def wall_time(self):
+        return datetime.fromtimestamp(self.now)
+
+
+class FakeDevice:
+    """Just enough of bluepy's ScanEntry for scan_ble_devices."""
+
+    def __init__(self, addr, rssi):
+        self.addr = addr
+        self.rssi = rssi
+        self.addrType = 'random'
+
+    def getValueText(self, adtype):
+        return '4c000215'
+
+    def getScanData(self):
+        return [(255, 'Manufacturer', '4c000215')]
+
+
+class SimulatedScanner:
+    """Replays PHASES, one device set per scan, advancing the fake clock."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.scans = [(phase, make(i)) for phase, count, make in PHASES for i in range(count)]
+        self.position = 0
+
+    def scan(self, duration):
+        self.clock.now += duration
+        _, macs = self.scans[self.position]
+        self.position += 1
+        return [FakeDevice(mac, -55) for mac in sorted(macs)]
+
+    def phase(self, position):
+        return self.scans[position][0]
+
+
+def read_scan_logs(logs_dir):
+    """Sidecar rows from every daily scans_*.csv, oldest first."""
+    rows = []
+    for name in sorted(os.listdir(logs_dir)):
+        if name.startswith('scans_'):
+            with open(os.path.join(logs_dir, name), newline='') as f:
+                rows.extend(csv.DictReader(f))
+    return rows
+
+
+def main():
+    import pandas as pd
+
+    start = (time.time() - START_HOURS_AGO * 3600) // 60 * 60
+    clock = FakeClock(start)
+    scanner = SimulatedScanner(clock)
+    scheduler = AdaptiveScheduler(SCAN_DURATION, 90.0,
+                                  min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        logs_dir = os.path.join(tmp, 'logs')
+        run_adaptive(scanner, scheduler, -75, {}, logs_dir=logs_dir,
+                     sleep=clock.sleep, clock=clock, now=clock.wall_time,
+                     max_scans=len(scanner.scans))
+
+        rows = read_scan_logs(logs_dir)
+        assert len(rows) == len(scanner.scans), len(rows)
+
+        intervals = {}
+        for position, row in enumerate(rows):
+            interval = float(row['Interval'])
+            intervals.setdefault(scanner.phase(position), []).append(interval)
+            assert MIN_INTERVAL <= interval <= MAX_INTERVAL, interval
+            assert abs(float(row['Scans Per Minute']) - 60.0 / interval) < 0.001, row
+
+        for phase, values in intervals.items():
+            print(f"{phase:>9}: intervals {' '.join(f'{value:.0f}' for value in values)}")
+
+        assert intervals['night'][-1] == MAX_INTERVAL, "a stable room should back off to the maximum"
+        assert intervals['arrivals'][-1] == MIN_INTERVAL, "churn should tighten to the minimum"
+        assert intervals['event'][-1] > intervals['event'][0], "a settled event should back off again"
+        print(f"{len(rows)} scans over {(clock.now - clock.start) / 3600:.1f} simulated hours")
+
+        # Each minute's expected count is its mean number of devices per scan
+        per_minute = {}
+        for row in rows:
+            per_minute.setdefault(row['Timestamp'][:16], []).append(int(row['Devices']))
+        expected = pd.Series({pd.Timestamp(minute, tz='UTC'): sum(devices) / len(devices)
+                              for minute, devices in per_minute.items()}).sort_index()
+        several = sum(1 for devices in per_minute.values() if len(devices) > 1)
+        span = int((expected.index[-1] - expected.index[0]).total_seconds() // 60) + 1
+        assert several > 0 and span > len(per_minute), "the run should have busy and sparse minutes"
+        print(f"{len(per_minute)} minutes with scans ({several} with several), "
+              f"{span - len(per_minute)} without, over {span} minutes")
+
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            from app import build_manufacturer_breakdown, smooth_like_totals, update_counts_csv
+            counts_df = update_counts_csv()
+            breakdown = build_manufacturer_breakdown()
+        finally:
+            os.chdir(cwd)
+
+        counts = counts_df.set_index('Timestamp')['Count']
+        assert list(counts.index) == list(expected.index), counts_df
+        assert (counts - expected).abs().max() < 0.001, pd.concat([counts, expected], axis=1)
+        print(f"Normalized counts match for all {len(counts)} minutes, "
+              f"{counts.min():.2f} to {counts.max():.2f} devices per scan")
+
+        # The breakdown is per scan like the totals, then smoothed and halved like the chart
+        smoothed = smooth_like_totals(expected.to_frame())[0]
+        manufacturer_totals = breakdown.sum(axis=1)
+        assert list(manufacturer_totals.index) == list(smoothed.index), breakdown
+        assert (manufacturer_totals - smoothed).abs().max() < 0.001, breakdown
+        print(f"Manufacturer breakdown matches for all {len(breakdown)} minutes")
+
+    print("Simulation passed")
+
+
+if __name__ == '__main__':
+    main()
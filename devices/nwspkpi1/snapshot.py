@@ -0,0 +1,94 @@
+import json
+import os
+from array import array
+
+# Kept to the standard library so it can be loaded before pandas and matplotlib
+
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'snapshot')
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def save_snapshot(version, last_update, minutes, values, payloads, charts,
+                  snapshot_dir=SNAPSHOT_DIR):
+    """Persist the last published data so a restarted app can serve it immediately.
+
+    `minutes` are epoch minutes and `values` the smoothed counts for them,
+    `payloads` maps cache attribute names to JSON strings, and `charts` maps
+    (width, height, fmt) to encoded images.
+
+    Data files are named after the version and never overwritten, and
+    meta.json, which names them, is replaced last. A crash mid-save leaves
+    the previous meta.json pointing at the previous, untouched files.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    series_file = f'series_{version}.bin'
+    series = array('i', minutes).tobytes() + array('f', values).tobytes()
+    _write_atomic(os.path.join(snapshot_dir, series_file), series)
+
+    chart_files = {}
+    for (width, height, fmt), body in charts.items():
+        filename = f'chart_{version}_{width}x{height}.{fmt}'
+        _write_atomic(os.path.join(snapshot_dir, filename), body)
+        chart_files[filename] = [width, height, fmt]
+
+    meta = {
+        'version': version,
+        'last_update': last_update,
+        'points': len(minutes),
+        'series': series_file,
+        'payloads': payloads,
+        'charts': chart_files,
+    }
+    _write_atomic(os.path.join(snapshot_dir, 'meta.json'), json.dumps(meta).encode('utf-8'))
+
+    # Drop the files of earlier snapshots
+    for filename in os.listdir(snapshot_dir):
+        if filename.startswith(('series_', 'chart_')) and \
+                filename != series_file and filename not in chart_files:
+            os.remove(os.path.join(snapshot_dir, filename))
+
+
+def load_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """Load a saved snapshot, or None if there isn't a usable one."""
+    meta_path = os.path.join(snapshot_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path, 'rb') as f:
+            meta = json.load(f)
+
+        charts = {}
+        for filename, (width, height, fmt) in meta['charts'].items():
+            with open(os.path.join(snapshot_dir, filename), 'rb') as f:
+                charts[(width, height, fmt)] = f.read()
+
+        with open(os.path.join(snapshot_dir, meta['series']), 'rb') as f:
+            series = f.read()
+        points = meta['points']
+        minutes = array('i')
+        minutes.frombytes(series[:points * minutes.itemsize])
+        values = array('f')
+        values.frombytes(series[points * minutes.itemsize:])
+        if len(values) != points:
+            raise ValueError(f"{meta['series']} does not match meta.json")
+
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error loading snapshot from {snapshot_dir}: {e}")
+        return None
+
+    return {
+        'version': meta['version'],
+        'last_update': meta['last_update'],
+        'minutes': minutes,
+        'values': values,
+        'payloads': meta['payloads'],
+        'charts': charts,
+    }
@@ -0,0 +1,125 @@
+import numpy as np
+
+ZONES = ('near', 'room', 'passing')
+
+# Lower RSSI edges (dBm) of the near and room bands; anything weaker is passing.
+# ble_scanner already drops detections below its --rssi_threshold of -75 dBm.
+ZONE_EDGES = (-60, -70)
+
+# How much a device in each zone counts towards the occupancy estimate
+ZONE_WEIGHTS = np.array([1.0, 0.8, 0.2])
+
+# Detections averaged per MAC to smooth out RSSI jitter
+SMOOTHING_WINDOW = 3
+
+# Per-MAC history is dropped after this many seconds without a detection
+STATE_TTL_SECONDS = 60 * 60
+
+
+class RssiZoner:
+    """Classify scan detections into near/room/passing zones from smoothed RSSI.
+
+    Each detection's RSSI is averaged with the MAC's previous SMOOTHING_WINDOW - 1
+    detections, carried over from earlier batches, and the average is binned into
+    a zone. Everything works on whole arrays: rows are sorted by MAC, and the
+    rolling mean is a difference of cumulative sums within each MAC's run.
+    """
+
+    def __init__(self, window=SMOOTHING_WINDOW, ttl_seconds=STATE_TTL_SECONDS):
+        self.window = window
+        self.ttl_seconds = ttl_seconds
+        # MAC -> (last seen epoch seconds, most recent RSSI readings, oldest first)
+        self.history = {}
+
+    def classify(self, epoch_seconds, macs, rssi):
+        """Return a zone index (into ZONES) for each detection, in the input order."""
+        epoch_seconds = np.asarray(epoch_seconds, dtype=np.int64)
+        rssi = np.asarray(rssi, dtype=np.float64)
+        n = len(rssi)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+
+        mac_names, mac_codes = np.unique(np.asarray(macs, dtype=object), return_inverse=True)
+
+        # Prepend each known MAC's carried-over readings as history rows
+        carry_codes, carry_rssi = [], []
+        for code, mac in enumerate(mac_names):
+            state = self.history.get(mac)
+            if state is not None:
+                carry_codes.extend([code] * len(state[1]))
+                carry_rssi.extend(state[1])
+        all_codes = np.concatenate((np.asarray(carry_codes, dtype=np.int64), mac_codes))
+        all_rssi = np.concatenate((np.asarray(carry_rssi, dtype=np.float64), rssi))
+        all_times = np.concatenate((np.full(len(carry_codes), np.iinfo(np.int64).min),
+                                    epoch_seconds))
+        is_new = np.concatenate((np.zeros(len(carry_codes), dtype=bool), np.ones(n, dtype=bool)))
+        original_order = np.concatenate((np.full(len(carry_codes), -1), np.arange(n)))
+
+        # Group rows by MAC, oldest first within each MAC
+        order = np.lexsort((all_times, all_codes))
+        codes = all_codes[order]
+        values = all_rssi[order]
+
+        # Position of each row within its MAC's run
+        run_starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        run_lengths = np.diff(np.r_[run_starts, len(codes)])
+        position = np.arange(len(codes)) - np.repeat(run_starts, run_lengths)
+
+        # Rolling mean over the last `window` readings of the same MAC
+        cumulative = np.concatenate(([0.0], np.cumsum(values)))
+        span = np.minimum(position + 1, self.window)
+        end = np.arange(1, len(codes) + 1)
+        smoothed = (cumulative[end] - cumulative[end - span]) / span
+
+        # Smoothed RSSI at or above a band's lower edge falls in that band
+        zones_sorted = np.digitize(-smoothed, [-edge for edge in ZONE_EDGES], right=True)
+
+        # Carry each MAC's newest readings into the next batch
+        run_ends = run_starts + run_lengths
+        times_sorted = all_times[order]
+        for run_start, run_end in zip(run_starts, run_ends):
+            keep_from = max(run_end - (self.window - 1), run_start)
+            self.history[mac_names[codes[run_start]]] = (
+                int(times_sorted[run_end - 1]), values[keep_from:run_end].tolist())
+        self._expire(int(epoch_seconds.max()))
+
+        zones = np.empty(n, dtype=np.int64)
+        new_sorted = is_new[order]
+        zones[original_order[order][new_sorted]] = zones_sorted[new_sorted]
+        return zones
+
+    def _expire(self, now):
+        cutoff = now - self.ttl_seconds
+        for mac in [mac for mac, (last_seen, _) in self.history.items() if last_seen < cutoff]:
+            del self.history[mac]
+
+
+def zone_minute_counts(epoch_minutes, macs, zones):
+    """Distinct devices per minute and zone, plus the weighted occupancy estimate.
+
+    A device seen in several zones within a minute is counted once, in its
+    nearest zone. Returns (minutes, counts) where counts has one column per zone
+    followed by the weighted total.
+    """
+    epoch_minutes = np.asarray(epoch_minutes, dtype=np.int64)
+    zones = np.asarray(zones, dtype=np.int64)
+    if len(zones) == 0:
+        return np.empty(0, dtype=np.int64), np.empty((0, len(ZONES) + 1))
+
+    _, mac_codes = np.unique(np.asarray(macs, dtype=object), return_inverse=True)
+
+    # Sort by minute, MAC, then zone so the nearest zone comes first for each device-minute
+    order = np.lexsort((zones, mac_codes, epoch_minutes))
+    minutes_sorted = epoch_minutes[order]
+    macs_sorted = mac_codes[order]
+    first = np.r_[True, (minutes_sorted[1:] != minutes_sorted[:-1]) |
+                        (macs_sorted[1:] != macs_sorted[:-1])]
+    device_minutes = minutes_sorted[first]
+    device_zones = zones[order][first]
+
+    minutes, minute_index = np.unique(device_minutes, return_inverse=True)
+    counts = np.zeros((len(minutes), len(ZONES)))
+    np.add.at(counts, (minute_index, device_zones), 1)
+
+    weighted = counts @ ZONE_WEIGHTS
+    return minutes, np.column_stack((counts, weighted))